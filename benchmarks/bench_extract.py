@@ -0,0 +1,81 @@
+"""Extraction throughput of Tar and Zip for different worker counts.
+
+Run from the repository root::
+
+    python benchmarks/bench_extract.py [FILES [FILE_SIZE [WORKERS ...]]]
+
+Builds an uncompressed tar and a deflated zip with FILES members of
+FILE_SIZE bytes in a temporary directory and extracts each of them with
+every worker count. On multi-core machines with fast disks throughput
+should grow close to linearly with the number of workers.
+"""
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tarman.containers import Tar  # noqa
+from tarman.containers import Zip  # noqa
+
+
+def make_corpus(directory, files, size):
+    chunk = os.urandom(size // 4)
+    data = (chunk + bytes(size // 4)) * 2 + b'x' * (size - len(chunk) * 4)
+    tarpath = os.path.join(directory, 'corpus.tar')
+    zippath = os.path.join(directory, 'corpus.zip')
+    with tarfile.open(tarpath, 'w') as tar:
+        with zipfile.ZipFile(zippath, 'w', zipfile.ZIP_DEFLATED) as z:
+            for i in range(files):
+                name = 'd{0}/f{1}'.format(i % 16, i)
+                path = os.path.join(directory, 'src')
+                with open(path, 'wb') as f:
+                    f.write(data)
+                tar.add(path, arcname=name)
+                z.write(path, arcname=name)
+    os.remove(os.path.join(directory, 'src'))
+    return tarpath, zippath
+
+
+def bench(aclass, path, directory, workers):
+    container = aclass(path)
+    target = os.path.join(directory, 'out')
+    start = time.time()
+    aclass.extract(container, container.archive, target, workers=workers)
+    elapsed = time.time() - start
+    shutil.rmtree(target)
+    return elapsed
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1024 * 1024
+    counts = [int(a) for a in sys.argv[3:]] or \
+        sorted(set([1, 2, 4, os.cpu_count() or 1]))
+    total = files * size / 1024.0 / 1024.0
+
+    directory = tempfile.mkdtemp()
+    try:
+        tarpath, zippath = make_corpus(directory, files, size)
+        print("{0} x {1} bytes, {2} cpus".format(
+            files, size, os.cpu_count()
+        ))
+        print("{0:>6} {1:>8} {2:>10} {3:>10}".format(
+            "format", "workers", "seconds", "MB/s"
+        ))
+        for aclass, path in [(Tar, tarpath), (Zip, zippath)]:
+            for workers in counts:
+                elapsed = bench(aclass, path, directory, workers)
+                print("{0:>6} {1:>8} {2:>10.3f} {3:>10.1f}".format(
+                    aclass.__name__, workers, elapsed, total / elapsed
+                ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
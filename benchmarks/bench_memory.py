@@ -0,0 +1,74 @@
+"""Memory used by the listing of a large archive.
+
+Run from the repository root::
+
+    python benchmarks/bench_memory.py [ENTRIES]
+
+Builds the listing of ENTRIES members (1M by default) spread over
+directories of 1000 files, once as a DirectoryTree of nodes with
+MemberInfo objects the way small archives are listed and once as a
+ColumnTree, and reports the memory traced by tracemalloc for each,
+excluding the member list itself.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tarman.columnar import ColumnTree  # noqa
+from tarman.containers import FileSystem  # noqa
+from tarman.containers import MemberInfo  # noqa
+from tarman.tree import DirectoryTree  # noqa
+
+
+def build_nodes(entries):
+    tree = DirectoryTree('/bench.tar', FileSystem())
+    nodes = tree.add_many(e[0] for e in entries)
+    for node, e in zip(nodes, entries):
+        node.info = MemberInfo(*e)
+    tree.update_totals()
+    return tree
+
+
+def build_columns(entries):
+    tree = ColumnTree('/bench.tar', FileSystem())
+    tree.add_entries(entries)
+    tree.update_totals()
+    return tree
+
+
+def measure(build, entries):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    tree = build(entries)
+    elapsed = time.time() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return tree, elapsed, used
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    members = [
+        ('top/d{0}/f{1}'.format(i // 1000, i), b'0', 1024, 0o644, 0, 0)
+        for i in range(entries)
+    ]
+    nodes = entries + (entries + 999) // 1000 + 2
+
+    print("{0:>14} {1:>10} {2:>10} {3:>10} {4:>12}".format(
+        "tree", "nodes", "seconds", "MB", "bytes/node"
+    ))
+    for build in (build_nodes, build_columns):
+        tree, elapsed, used = measure(build, members)
+        print("{0:>14} {1:>10} {2:>10.2f} {3:>10.1f} {4:>12.1f}".format(
+            tree.__class__.__name__, nodes, elapsed, used / 1e6,
+            used / nodes
+        ))
+        del tree
+
+
+if __name__ == "__main__":
+    main()
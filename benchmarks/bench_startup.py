@@ -0,0 +1,110 @@
+"""Startup time of tarman.
+
+Run from the repository root::
+
+    python benchmarks/bench_startup.py [RUNS]
+
+Reports the best of RUNS (10 by default) for the import time of the
+package and of the browser as measured by ``python -X importtime``, the
+wall clock time of ``tarman --version`` and the time until the browser
+has painted its first screen in a pseudo terminal.
+"""
+import os
+import pty
+import select
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def environment():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SRC
+    env['TERM'] = env.get('TERM', 'xterm')
+    return env
+
+
+def import_time(module):
+    """Cumulative import time of `module` in microseconds."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        env=environment(), stderr=subprocess.PIPE, check=True
+    )
+    for line in result.stderr.decode().splitlines():
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    return None
+
+
+def version_time():
+    start = time.time()
+    subprocess.run(
+        [sys.executable, '-m', 'tarman', '--version'],
+        env=environment(), stdout=subprocess.DEVNULL, check=True
+    )
+    return time.time() - start
+
+
+def first_paint_time(directory):
+    """Seconds until the first row of the listing was written."""
+    start = time.time()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ.update(environment())
+        os.environ['TARMAN_CACHE_DIR'] = ''
+        os.execv(sys.executable, [sys.executable, '-m', 'tarman', directory])
+    output = b''
+    elapsed = None
+    try:
+        while elapsed is None and time.time() - start < 30:
+            ready, _, _ = select.select([fd], [], [], 0.01)
+            if ready:
+                output += os.read(fd, 65536)
+                if b'[ ]' in output:
+                    elapsed = time.time() - start
+        os.write(fd, b'q')
+        while True:
+            ready, _, _ = select.select([fd], [], [], 1)
+            if not ready or not os.read(fd, 65536):
+                break
+    except OSError:
+        pass
+    finally:
+        os.waitpid(pid, 0)
+        os.close(fd)
+    return elapsed
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    directory = tempfile.mkdtemp()
+    try:
+        for i in range(20):
+            open(os.path.join(directory, 'f{0}'.format(i)), 'w').close()
+
+        results = [
+            ("import tarman (ms)",
+             lambda: import_time('tarman') / 1000.0),
+            ("import tarman.browser (ms)",
+             lambda: import_time('tarman.browser') / 1000.0),
+            ("tarman --version (ms)",
+             lambda: version_time() * 1000),
+            ("first paint (ms)",
+             lambda: first_paint_time(directory) * 1000),
+        ]
+        for label, measure in results:
+            print("{0:<28} {1:>8.1f}".format(
+                label, min(measure() for i in range(runs))
+            ))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
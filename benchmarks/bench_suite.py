@@ -0,0 +1,267 @@
+"""Benchmark suite on synthetic archives.
+
+Run from the repository root::
+
+    python benchmarks/bench_suite.py [--scales 10000,100000,1000000]
+        [--huge 4x64] [--corpus DIR] [--output FILE] [--compare FILE]
+
+Generates tar, tar.gz and zip corpora of every scale in two shapes, flat
+(all members in one directory) and deep (directories nested four wide,
+four files in each of the deepest ones), and one of a few huge members.
+Generating the 1M corpora takes several minutes, keep them in a --corpus
+directory to reuse them in later runs.
+
+Every corpus is measured in a process of its own, so the peak memory
+(maximum resident set size) belongs to it alone. The timings are for
+opening the archive with Tar/Zip, listdir and isenterable of every
+directory and member, DirectoryTree.add and lookups of up to SAMPLE
+members, count_items of every directory, ViewArea of up to SAMPLE
+directories and extracting corpora of up to --extract-limit members.
+
+Results are written to FILE (bench_suite.json by default) as JSON, with
+--compare the timings of an earlier run are printed next to them.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tarman.constants import VERSION  # noqa
+from tarman.containers import Archive  # noqa
+from tarman.helpers import get_archive_class  # noqa
+from tarman.tree import DirectoryTree  # noqa
+from tarman.viewarea import ViewArea  # noqa
+
+FORMATS = ('tar', 'tar.gz', 'zip')
+SAMPLE = 10000
+TIMERS = (
+    'open', 'listdir', 'isenterable', 'tree.add', 'lookup', 'count_items',
+    'viewarea', 'extract'
+)
+MEMBER = b'tarman benchmark member\n' * 4
+
+
+def flat_names(entries):
+    for i in range(entries):
+        yield 'flat/f{0}'.format(i), MEMBER
+
+
+def deep_names(entries):
+    levels = max(1, int(math.ceil(math.log(entries, 4))) - 1)
+    for i in range(entries):
+        dirs = [
+            'd{0}'.format((i >> (2 * k)) & 3) for k in range(levels, 0, -1)
+        ]
+        yield '/'.join(['deep'] + dirs + ['f{0}'.format(i)]), MEMBER
+
+
+def huge_names(count, size):
+    chunk = os.urandom(1024 * 1024)
+    data = (chunk * (size // len(chunk) + 1))[:size]
+    for i in range(count):
+        yield 'huge/h{0}'.format(i), data
+
+
+def generate(directory, name, members):
+    """Write `members`, (name, data) pairs, to a tar, tar.gz and zip in
+    `directory` in one pass and return their paths, existing ones are
+    reused.
+    """
+    paths = [
+        os.path.join(directory, '{0}.{1}'.format(name, fmt))
+        for fmt in FORMATS
+    ]
+    if all(os.path.exists(p) for p in paths):
+        return paths
+
+    tmp = [p + '.tmp' for p in paths]
+    tar = tarfile.open(tmp[0], 'w')
+    tgz = tarfile.open(tmp[1], 'w:gz', compresslevel=6)
+    z = zipfile.ZipFile(tmp[2], 'w', zipfile.ZIP_DEFLATED)
+    now = time.time()
+    with tar, tgz, z:
+        for member, data in members:
+            info = tarfile.TarInfo(member)
+            info.size = len(data)
+            info.mtime = now
+            for archive in (tar, tgz):
+                archive.addfile(info, io.BytesIO(data))
+            z.writestr(member, data)
+    for t, p in zip(tmp, paths):
+        os.rename(t, p)
+    return paths
+
+
+def timed(timings, calls, name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+    calls[name] = calls.get(name, 0) + 1
+    return result
+
+
+def sample(items, size=SAMPLE):
+    step = max(1, len(items) // size)
+    return items[::step][:size]
+
+
+def measure(path, extract_limit):
+    """Timings, call counts and peak memory for the archive at `path`."""
+    Archive.cache = None
+    timings = {}
+    calls = {}
+    aclass = get_archive_class(path)
+    container = timed(timings, calls, 'open', aclass, path)
+
+    # every directory and member, without a recursion
+    dirs = []
+    files = []
+    stack = [container.path]
+    while stack:
+        d = stack.pop()
+        dirs.append(d)
+        for name in timed(timings, calls, 'listdir', container.listdir, d):
+            p = container.join(d, name)
+            if timed(timings, calls, 'isenterable', container.isenterable,
+                     p):
+                stack.append(p)
+            else:
+                files.append(p)
+
+    members = sample(files)
+    tree = DirectoryTree(container.path, container)
+    for p in members:
+        timed(timings, calls, 'tree.add', tree.add, p)
+    for p in members:
+        timed(timings, calls, 'lookup', container.tree.__getitem__, p)
+    for d in dirs:
+        timed(timings, calls, 'count_items', container.count_items, d)
+    for d in sample(dirs):
+        timed(timings, calls, 'viewarea', ViewArea, d, 40, container)
+
+    if len(files) <= extract_limit:
+        target = tempfile.mkdtemp()
+        try:
+            timed(timings, calls, 'extract', aclass.extract, container,
+                  container.archive, target)
+        finally:
+            shutil.rmtree(target)
+
+    return {
+        'entries': len(files),
+        'directories': len(dirs),
+        'bytes': os.path.getsize(path),
+        'timings': timings,
+        'calls': calls,
+        # kilobytes on Linux
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run(path, extract_limit):
+    output = subprocess.check_output([
+        sys.executable, __file__, '--measure', path,
+        '--extract-limit', str(extract_limit)
+    ])
+    return json.loads(output.decode())
+
+
+def corpora(directory, scales, huge):
+    for entries in scales:
+        for shape, names in (('flat', flat_names), ('deep', deep_names)):
+            name = '{0}-{1}'.format(shape, entries)
+            for path in generate(directory, name, names(entries)):
+                yield name, path
+    if huge:
+        count, size = huge
+        name = 'huge-{0}x{1}'.format(count, size // 1024 // 1024)
+        for path in generate(directory, name, huge_names(count, size)):
+            yield name, path
+
+
+def show(result, old=None):
+    print("{0:<28} {1:>9} entries {2:>9.1f} MB peak".format(
+        result['corpus'], result['entries'], result['peak_rss'] / 1024.0
+    ))
+    for timer in TIMERS:
+        if timer not in result['timings']:
+            continue
+        line = "    {0:<14} {1:>9} calls {2:>10.4f} s".format(
+            timer, result['calls'][timer], result['timings'][timer]
+        )
+        if old and timer in old['timings'] and old['timings'][timer]:
+            line += "  x{0:.2f} of {1:.4f} s".format(
+                result['timings'][timer] / old['timings'][timer],
+                old['timings'][timer]
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scales', default='10000,100000,1000000')
+    parser.add_argument('--huge', default='4x64',
+                        help="COUNTxMEGABYTES, 0 to skip")
+    parser.add_argument('--corpus', help="keep the corpora in this directory")
+    parser.add_argument('--output', default='bench_suite.json')
+    parser.add_argument('--compare', help="results of an earlier run")
+    parser.add_argument('--extract-limit', type=int, default=100000)
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.extract_limit)))
+        return
+
+    scales = [int(s) for s in args.scales.split(',') if s]
+    huge = None
+    if args.huge != '0':
+        count, size = args.huge.split('x')
+        huge = (int(count), int(size) * 1024 * 1024)
+    old = {}
+    if args.compare:
+        with open(args.compare) as f:
+            old = dict(
+                (r['corpus'], r) for r in json.load(f)['results']
+            )
+
+    directory = args.corpus or tempfile.mkdtemp()
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    results = []
+    try:
+        for name, path in corpora(directory, scales, huge):
+            result = run(path, args.extract_limit)
+            result['corpus'] = os.path.basename(path)
+            show(result, old.get(result['corpus']))
+            results.append(result)
+    finally:
+        if not args.corpus:
+            shutil.rmtree(directory)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'version': VERSION,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+    print("Results written to {0}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Timings for DirectoryTree on flat directories.
+
+Run from the repository root::
+
+    python benchmarks/bench_tree.py [ENTRIES ...]
+
+With hash-indexed children the cost per entry stays flat as the
+directory grows; a linear sibling scan would double it at every step.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tarman.containers import FileSystem  # noqa
+from tarman.tree import DirectoryTree  # noqa
+
+
+def bench_flat(entries, root='/bench'):
+    tree = DirectoryTree(root, FileSystem())
+    paths = [os.path.join(root, 'f{0}'.format(i)) for i in range(entries)]
+
+    start = time.time()
+    for path in paths:
+        tree.add(path)
+    add_time = time.time() - start
+
+    start = time.time()
+    for path in paths:
+        path in tree
+    lookup_time = time.time() - start
+
+    start = time.time()
+    for path in paths:
+        del tree[path]
+    del_time = time.time() - start
+
+    return add_time, lookup_time, del_time
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [12500, 25000, 50000, 100000]
+    print("{0:>10} {1:>10} {2:>10} {3:>10} {4:>12}".format(
+        "entries", "add", "lookup", "delete", "us/entry"
+    ))
+    for entries in sizes:
+        add_time, lookup_time, del_time = bench_flat(entries)
+        total = add_time + lookup_time + del_time
+        print("{0:>10} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>12.2f}".format(
+            entries, add_time, lookup_time, del_time,
+            total * 1e6 / entries
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -38,7 +38,7 @@ long_description = \
 
 setup(
     name='tarman',
-    version="0.1.3",
+    version=constants.VERSION,
     description="",
     long_description=long_description,
     classifiers=[
@@ -78,6 +78,8 @@ setup(
             'tests/testdata/testdata/b/ba/baa/baab',
             'tests/testdata/testdata/b/ba/baa/baaa/baaaa',
             'tests/testdata/testdata.tar.gz',
+            'tests/testdata/testdata.7z',
+            'tests/testdata/testdata.tar.zst',
             'tests/testdata/tešt.tar',
             'tests/testdata/corrupted.tar',
         ]
@@ -0,0 +1,4 @@
+from tarman import main
+
+
+main()
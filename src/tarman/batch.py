@@ -0,0 +1,163 @@
+"""Extraction of many archives at once on a process pool.
+
+Every archive is extracted by one worker process into a directory of its
+own below the target, named after the archive without its extension. The
+number of files read and written at the same time is capped at `io`:
+there are never more than `io` processes and each of them extracts on
+`io // processes` threads. An archive that fails, because it is damaged
+or no archive at all, is reported and the rest go on. So is one that
+kills the process extracting it.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from tarman.helpers import get_archive_class
+
+import glob
+import os
+import time
+
+
+def expand(patterns):
+    """Paths of `patterns`, which may be glob patterns, in order and
+    without duplicates.
+    """
+    result = []
+    seen = set()
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) \
+            else [pattern]
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in seen:
+                seen.add(path)
+                result.append(path)
+    return result
+
+
+def target_name(path, aclass=None):
+    name = os.path.basename(path)
+    for ext in sorted(aclass.extensions if aclass else (), key=len,
+                      reverse=True):
+        if name.lower().endswith(ext) and len(name) > len(ext):
+            return name[:-len(ext)]
+    return name + '.d'
+
+
+def targets(paths, target_path):
+    """Extraction directory of every archive, unique even for archives of
+    the same name.
+    """
+    result = []
+    used = set()
+    for path in paths:
+        aclass = get_archive_class(path)
+        name = target_name(path, aclass)
+        unique = name
+        i = 1
+        while unique in used:
+            unique = '{0}-{1}'.format(name, i)
+            i += 1
+        used.add(unique)
+        result.append(os.path.join(target_path, unique))
+    return result
+
+
+def extract_one(path, target, threads):
+    """Extract the archive at `path` into `target`, in a worker process,
+    and return its report entry.
+    """
+    report = {
+        'archive': path, 'target': target, 'bytes': 0, 'seconds': 0.0,
+        'error': None,
+    }
+    start = time.time()
+    try:
+        report['bytes'] = os.path.getsize(path)
+        aclass = get_archive_class(path)
+        if aclass is None:
+            raise IOError("not an archive")
+        archive = aclass.open(path)
+        try:
+            aclass.extract(None, archive, target, workers=threads)
+        finally:
+            archive.close()
+    except Exception as e:
+        report['error'] = "{0}: {1}".format(e.__class__.__name__, e)
+    report['seconds'] = time.time() - start
+    return report
+
+
+def failed(path, target, error):
+    return {
+        'archive': path, 'target': target, 'bytes': 0, 'seconds': 0.0,
+        'error': "{0}: {1}".format(error.__class__.__name__, error),
+    }
+
+
+def run(jobs, processes, threads, done):
+    """Extract `jobs`, (path, target) pairs, on a pool of `processes` and
+    pass the report entry of every one to `done`. Return the jobs that
+    did not finish because a worker died, which breaks the whole pool,
+    with the exception that broke it.
+    """
+    broken = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = dict(
+            (pool.submit(extract_one, path, target, threads), (path, target))
+            for path, target in jobs
+        )
+        for future in as_completed(futures):
+            path, target = futures[future]
+            try:
+                entry = future.result()
+            except BrokenProcessPool as e:
+                broken.append(((path, target), e))
+                continue
+            except Exception as e:
+                entry = failed(path, target, e)
+            done(entry)
+    return broken
+
+
+def extract(paths, target_path, processes=None, io=None, done=None):
+    """Extract the archives at `paths` below `target_path` and return the
+    report, a dictionary with an entry per archive in 'archives'. `done`
+    is called with every entry as soon as its archive is finished.
+    """
+    processes = processes or os.cpu_count() or 1
+    io = io or processes
+    processes = max(1, min(processes, io, len(paths)))
+    threads = max(1, io // processes)
+
+    start = time.time()
+    entries = []
+
+    def finish(entry):
+        entries.append(entry)
+        if done is not None:
+            done(entry)
+
+    jobs = list(zip(paths, targets(paths, target_path)))
+    # which archive killed its worker is not known, the ones that were not
+    # finished then are extracted again one by one, each in a process of
+    # its own, and only the one that kills it again fails
+    for job, error in run(jobs, processes, threads, finish):
+        for retry_job, retry_error in run([job], 1, threads, finish):
+            finish(failed(retry_job[0], retry_job[1], retry_error))
+    seconds = time.time() - start
+
+    order = dict((path, i) for i, path in enumerate(paths))
+    entries.sort(key=lambda e: order[e['archive']])
+    ok = [e for e in entries if e['error'] is None]
+    size = sum(e['bytes'] for e in ok)
+    return {
+        'archives': entries,
+        'extracted': len(ok),
+        'failed': len(entries) - len(ok),
+        'bytes': size,
+        'seconds': seconds,
+        'throughput': size / seconds if seconds else 0.0,
+        'processes': processes,
+        'threads': threads,
+    }
@@ -0,0 +1,651 @@
+"""The curses file browser."""
+from tarman import lazy
+from tarman import profiling
+from tarman.cache import OpenArchives
+from tarman.constants import HEADER_LNS
+from tarman.constants import HELP_STRING
+from tarman.constants import OPEN_ARCHIVES_SIZE
+from tarman.constants import SCAN_POLL
+from tarman.containers import Archive
+from tarman.containers import FileSystem
+from tarman.exceptions import OutOfRange
+from tarman.helpers import configure
+from tarman.helpers import format_size
+from tarman.helpers import get_archive_class
+from tarman.helpers import get_archive_class_by_name
+from tarman.helpers import maybe_archive
+from tarman.tree import SelectionTree
+from tarman.viewarea import ViewArea
+
+import bisect
+import curses
+import curses.ascii
+import locale
+import logging
+import os
+import pwd
+import traceback
+
+overlaywin = lazy.module('tarman.overlaywin')
+
+
+class Main(object):
+
+    # bytes the listings of open archives may take, see OpenArchives
+    memory = OPEN_ARCHIVES_SIZE
+
+    def __init__(self, mainscr, stdscr, directory, encoding):
+        self.encoding = encoding
+        self.header_lns = HEADER_LNS
+        self.mainscr = mainscr
+        self.stdscr = stdscr
+        self.color = curses.has_colors()
+        if self.color:
+            # set file type attributes (color and bold)
+            curses.init_pair(1, curses.COLOR_BLUE, -1)
+            self.attr_folder = curses.color_pair(1) | curses.A_BOLD
+            curses.init_pair(2, 7, -1)
+            self.attr_norm = curses.color_pair(2)
+
+            # set wright / wrong attributes (color and bold)
+            curses.init_pair(3, curses.COLOR_GREEN, -1)
+            self.attr_wright = curses.color_pair(3) | curses.A_BOLD
+
+            curses.init_pair(4, curses.COLOR_RED, -1)
+            self.attr_wrong = curses.color_pair(4) | curses.A_BOLD
+
+        self.kill = False
+        self.ch = -1
+        # path -> [selected index, SelectionTree of its container], the
+        # containers themselves are in self.archives while they are open
+        self.visited = {}
+        self.archives = OpenArchives(self.memory)
+        self.area = None
+        self.lines = {}
+        self.drawn = None
+        self.container = FileSystem()
+        self.directory = self.container.abspath(directory)
+        self.checked = SelectionTree(self.directory, self.container)
+        self.chdir(self.directory)
+
+    def header(self, prefix, path):
+        h, w = self.mainscr.getmaxyx()
+        sep = "  "
+        length = len(prefix) + len(path) + len(sep)
+        empty = 0
+        if length > w:
+            path = "..." + path[length - w + 3:]
+        else:
+            empty = w - length
+        self.mainscr.addstr(
+            0, 0,
+            "{0}{1}{2}{3}".format(
+                prefix, sep, path, empty * ' '
+            ).encode(self.encoding)
+        )
+        self.mainscr.refresh()
+
+    def identify_container_and_checked(self, path):
+        if self.container.isenterable(path):  # is folder
+            return self.container, self.checked
+
+        if self.scanning():
+            # members are looked up in a listing that is not complete yet
+            return None, None
+
+        # zip, libarchive and nested archives are read at once, tar
+        # archives in the background, see poll
+        workwin = overlaywin.WorkWin(self)
+        workwin.show("Working ...")
+        try:
+            if isinstance(self.container, FileSystem):
+                aclass = get_archive_class(path)
+                if not aclass:
+                    return None, None
+                newcontainer = aclass(path, background=True)
+            else:
+                newcontainer = self.open_nested(self.container, path)
+                if newcontainer is None:
+                    return None, None
+        finally:
+            workwin.close()
+
+        newchecked = SelectionTree(path, newcontainer)
+        self.archives.add(newcontainer)
+
+        return newcontainer, newchecked
+
+    def open_nested(self, parent, path):
+        """Archive that is the member at `path` of the archive `parent`, None
+        if it is no archive or can not be read. It is read at once from the
+        member, which is copied to a temporary file first if `parent` can
+        not seek in it, see Archive.openmember.
+        """
+        stream = None
+        try:
+            stream = parent.openmember(path, accept=maybe_archive)
+            aclass = stream and get_archive_class(path, stream)
+            if not aclass:
+                return None
+            newcontainer = aclass(path, fileobj=stream, parent=parent)
+            stream = None
+            return newcontainer
+        except Exception as e:
+            logging.error("Opening '{0}' failed: {1}".format(path, e))
+            return None
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def open_archive(self, container, background=False):
+        """The open archive of the path of `container`, the one that is in
+        self.archives or one opened again, None if it can not be.
+        """
+        archive = self.archives.get(container.path)
+        if archive is not None:
+            return archive
+        logging.info("Reopening '{0}'".format(container.path))
+        if container.parent is None:
+            aclass = get_archive_class(container.path)
+            if not aclass:
+                return None
+            return aclass(container.path, background=background)
+        parent = self.open_archive(container.parent)
+        if parent is None or container.path not in parent.tree:
+            return None
+        self.archives.add(parent)
+        return self.open_nested(parent, container.path)
+
+    def reopen(self, checked, path):
+        """Container of `checked` to show `path` of, opened again if it was
+        closed to save memory meanwhile, None if it can not be.
+        """
+        container = checked.container
+        if not isinstance(container, Archive):
+            return container
+        if container in self.archives:
+            self.archives.add(container)
+            return container
+
+        # paths inside of the archive are only known once it is read
+        workwin = overlaywin.WorkWin(self)
+        workwin.show("Working ...")
+        try:
+            container = self.open_archive(
+                container, background=path == container.path
+            )
+        finally:
+            workwin.close()
+        if container is None:
+            return None
+        if path not in container.tree:
+            if container not in self.archives:
+                container.close()
+            return None
+        checked.rebind(container)
+        self.archives.add(container)
+        return container
+
+    def scanning(self):
+        return isinstance(self.container, Archive) and \
+            self.container.scan is not None
+
+    def show_header(self):
+        title = self.container.__class__.__name__
+        if self.scanning():
+            title = "{0} (reading, {1} entries, ESC to stop)".format(
+                title, len(self.container.entries)
+            )
+        self.header(title, self.area.abspath)
+
+    def poll(self):
+        """Take over what background scans read meanwhile and show it when
+        it belongs to the current archive.
+        """
+        polled = 0
+        for container in self.archives:
+            if container is not self.container:
+                polled += container.poll()
+        if polled:
+            self.archives.evict(keep=self.container)
+        if not self.scanning():
+            return
+
+        added = self.container.poll()
+        if self.container.scan is None:
+            if self.container.error is not None:
+                logging.error("Reading '{0}' failed: {1}".format(
+                    self.container.path, self.container.error
+                ))
+            self.lines = {}  # sizes are known now
+        elif not added:
+            return
+
+        # keep the cursor on the same name while entries are sorted in
+        h, w = self.stdscr.getmaxyx()
+        old = self.area
+        area = ViewArea(old.abspath, h, self.container)
+        if old.list and old.selected >= 0:
+            area.first = old.first
+            area.set_params(
+                h, offset=bisect.bisect_left(area.list, old[old.selected])
+            )
+        self.area = area
+        self.show_header()
+        self.refresh_scr()
+
+    def stop_scan(self):
+        """Drop the archive that is still being read and return to the
+        directory it is in.
+        """
+        container = self.container
+        self.archives.discard(container)
+        container.close()
+        self.chdir(self.container.dirname(container.path))
+        for path, state in list(self.visited.items()):
+            if state[1].container is container:
+                del self.visited[path]
+
+    @profiling.timed('chdir')
+    def chdir(self, newpath):
+        if newpath is None:
+            return False
+
+        if not newpath.startswith(self.directory):
+            return False
+
+        try:
+            if self.area is None:
+                oldsel = 0
+                oldpath = self.directory
+            else:
+                oldsel = self.area.selected
+                oldpath = self.area.abspath
+
+            oldcontainer = self.container
+            oldchecked = self.checked
+
+            if newpath in self.visited:
+                newsel, newchecked = self.visited[newpath]
+                newcontainer = self.reopen(newchecked, newpath)
+                if newcontainer is None:
+                    return False
+            else:
+                newcontainer, newchecked = \
+                    self.identify_container_and_checked(newpath)
+                if newcontainer is None:
+                    return False
+                newsel = 0
+
+            self.visited[oldpath] = [oldsel, oldchecked]
+            logging.info("OLD - {0} - {1} - {2}".format(
+                oldpath, oldsel, oldcontainer.__class__.__name__
+            ))
+            logging.info("NEW - {0} - {1} - {2}".format(
+                newpath, newsel, newcontainer.__class__.__name__
+            ))
+
+            h, w = self.stdscr.getmaxyx()
+            self.container = newcontainer
+            self.checked = newchecked
+
+            self.area = ViewArea(
+                newpath, h, newcontainer
+            )
+            self.lines = {}
+            self.archives.evict(keep=newcontainer)
+
+            self.show_header()
+            self.area.set_params(h, offset=newsel)
+            self.refresh_scr()
+
+            return True
+        except OutOfRange:
+            logging.error("OutOfRange .. {0}".format(newpath))
+            curses.flash()
+
+    def line(self, abspath, name):
+        """Name, attribute and size text of an entry, these do not change
+        while its directory is shown.
+        """
+        line = self.lines.get(abspath)
+        if line is None:
+            enterable = self.container.isenterable(abspath)
+            if enterable:
+                name = u"{0}/".format(name)
+            if not self.color:
+                attr = curses.A_NORMAL
+            elif enterable:
+                attr = self.attr_folder
+            else:
+                attr = self.attr_norm
+            # archives know the size of every entry, directories included
+            size = self.container.getsize(abspath)
+            size = "" if size is None else " {0}".format(format_size(size))
+            line = (name, attr, size)
+            self.lines[abspath] = line
+        return line
+
+    @profiling.timed('render.line')
+    def insert_line(self, y, row):
+        checked, selected, name, attr, size = row
+        h, w = self.stdscr.getmaxyx()
+        self.stdscr.move(y, 0)
+        self.stdscr.clrtoeol()
+        self.stdscr.addstr(y, 0, b"[*]" if checked else b"[ ]")
+        self.stdscr.addstr(
+            y, 5, name[:max(w - len(size) - 6, 0)].encode(self.encoding), attr
+        )
+        if size:
+            self.stdscr.addstr(
+                y, w - len(size) - 1, size.encode(self.encoding)
+            )
+        if selected:
+            self.stdscr.chgat(y, 0, w, curses.A_REVERSE)
+
+    @profiling.timed('render')
+    def refresh_scr(self, full=False):
+        """Repaint the rows that differ from what the screen shows, or all of
+        them with `full` (after an overlay window drew over the rows).
+        """
+        if not getattr(self, 'area', None):
+            self.stdscr.erase()
+            self.drawn = None
+            return
+
+        h, w = self.stdscr.getmaxyx()
+
+        if len(self.area) == 0:
+            self.stdscr.erase()
+            self.stdscr.addstr(1, 5, "Directory is empty!")
+            self.drawn = None
+            return
+
+        shown = (self.container, self.area.abspath)
+        if full or self.drawn is None or self.drawn_area != shown \
+                or self.drawn_size != (h, w):
+            self.stdscr.erase()
+            self.drawn = [None] * h
+            self.drawn_area = shown
+            self.drawn_size = (h, w)
+        elif self.area.first != self.drawn_first:
+            delta = self.area.first - self.drawn_first
+            if abs(delta) < h:
+                # let the terminal move the rows that stay visible
+                self.stdscr.scrollok(True)
+                self.stdscr.scroll(delta)
+                self.stdscr.scrollok(False)
+                if delta > 0:
+                    self.drawn = self.drawn[delta:] + [None] * delta
+                else:
+                    self.drawn = [None] * -delta + self.drawn[:delta]
+            else:
+                self.stdscr.erase()
+                self.drawn = [None] * h
+        self.drawn_first = self.area.first
+
+        y = 0
+        for i, name, abspath in self.area:
+            row = (
+                abspath in self.checked, i == self.area.selected
+            ) + self.line(abspath, name)
+            if self.drawn[y] != row:
+                self.insert_line(y, row)
+                self.drawn[y] = row
+            y += 1
+        for y in range(y, h):
+            if self.drawn[y] is not None:
+                self.stdscr.move(y, 0)
+                self.stdscr.clrtoeol()
+                self.drawn[y] = None
+
+        self.stdscr.move(self.area.selected_local, 1)
+
+    def loop(self):
+        while not self.kill:
+            # wake up to show what a background scan read meanwhile
+            self.stdscr.timeout(SCAN_POLL if self.scanning() else -1)
+            self.ch = self.stdscr.getch()
+            self.poll()
+            h, w = self.stdscr.getmaxyx()
+
+            if self.ch in [ord('q'), ]:
+                self.kill = True
+
+            elif self.ch == 27:
+                if self.scanning():
+                    self.stop_scan()
+
+            elif self.ch == curses.KEY_UP:
+                self.area.set_params(h, offset=-1)
+
+            elif self.ch == curses.KEY_DOWN:
+                self.area.set_params(h, offset=1)
+
+            elif self.ch == curses.KEY_PPAGE:
+                self.area.set_params(h, offset=-5)
+
+            elif self.ch == curses.KEY_NPAGE:
+                self.area.set_params(h, offset=5)
+
+            elif self.ch == 32:
+                index = self.area.selected
+                if index == -1:
+                    curses.flash()
+                    continue
+                abspath = self.area.get_abspath(index)
+                if abspath in self.checked:
+                    del self.checked[abspath]
+                else:
+                    self.checked.add(abspath, sub=True)
+
+            elif self.ch in [curses.KEY_RIGHT, 10, 13]:
+                index = self.area.selected
+                if index == -1:
+                    curses.flash()
+                    continue
+                abspath = self.area.get_abspath(index)
+
+                result = self.chdir(abspath)
+                if not result:
+                    curses.flash()
+
+            elif self.ch in [curses.KEY_LEFT,
+                             127, curses.ascii.BS, curses.KEY_BACKSPACE]:
+                if not self.chdir(
+                    self.container.dirname(self.area.abspath)
+                ):
+                    curses.flash()
+
+            elif self.ch in [ord('c'), ord('C')]:
+                if isinstance(self.container, FileSystem):
+                    aclass = self.container.__class__
+                    checked = self.checked
+                    container = self.container
+
+                    pathwin = overlaywin.PathWin(self)
+                    exitstatus, archivepath = pathwin.show(
+                        "Create archive with format/compression based on file"
+                        " extension (ENTER to confirm or ESC to cancel):",
+                        os.path.join(os.getcwd(), "NewArchive.tar.gz")
+                    )
+                    pathwin.close()
+                    logging.info("window exitstatus: {0}, '{1}'".format(
+                        exitstatus, archivepath
+                    ))
+                    if exitstatus != 0:
+                        continue
+
+                    archivepath = os.path.abspath(archivepath)
+                    aclass = get_archive_class_by_name(archivepath)
+                    if aclass is None:
+                        curses.flash()
+                        continue
+
+                    workwin = overlaywin.WorkWin(self)
+                    workwin.show("Creating ...")
+                    created = aclass.create(container, archivepath, checked)
+                    workwin.close()
+
+                    if created:
+                        overlaywin.TextWin(self).show(
+                            "Successfully created archive:\n{0}".format(
+                                archivepath
+                            )
+                        )
+                    else:
+                        curses.flash()
+
+            elif self.ch in [ord('e'), ord('E')]:
+                if self.scanning():
+                    curses.flash()
+                    continue
+                if isinstance(self.container, Archive):
+                    aclass = self.container.__class__
+                    archive = self.container.archive
+                    checked = self.checked
+                    container = self.container
+                else:
+                    index = self.area.selected
+                    if index == -1:
+                        curses.flash()
+                        continue
+                    abspath = self.area.get_abspath(index)
+                    if not abspath:
+                        curses.flash()
+                        continue
+                    aclass = get_archive_class(abspath)
+                    if aclass is None:
+                        curses.flash()
+                        continue
+                    archive = aclass.open(abspath)
+                    checked = None
+                    container = None
+
+                pathwin = overlaywin.PathWin(self)
+                exitstatus, s = pathwin.show(
+                    "Extract to "
+                    "(press ENTER for confirmation or ESC to cancel):"
+                )
+                pathwin.close()
+                logging.info("window exitstatus: {0}, '{1}'".format(
+                    exitstatus, s
+                ))
+                if exitstatus != 0:
+                    continue
+
+                workwin = overlaywin.WorkWin(self)
+                workwin.show("Extracting ...")
+                aclass.extract(container, archive, s, checked=checked)
+                workwin.close()
+
+                overlaywin.TextWin(self).show(
+                    "Extracted to:\n{0}".format(s)
+                )
+
+            elif self.ch in [ord('?'), curses.KEY_F1]:
+                curses.curs_set(0)
+                textwin = overlaywin.TextWin(self)
+                textwin.show(HELP_STRING)
+
+            if self.ch != -1:
+                self.refresh_scr()
+
+            if self.kill:
+                break
+
+    def cancel(self):
+        self.kill = True
+
+
+def main(arg_directory):
+    # we need faster esc delay for more responsive program
+    os.environ['ESCDELAY'] = '25'
+
+    home_dir = pwd.getpwuid(os.getuid()).pw_dir
+    log_file = os.path.join(home_dir, '.tarman.log')
+
+    # check if 'log_file' is writable
+    # os.access  # returns False if file does not exists
+    # os.access  # on parent directory does not check for files inside
+    # therefore this is the wright solution
+    try:
+        with open(log_file, "w") as tmp_file:
+            tmp_file.write("#")
+
+        logging.basicConfig(
+            filename=log_file,
+            filemode='w', level=logging.DEBUG
+        )
+    except:
+        logging.basicConfig(level=logging.DEBUG)
+
+    configure(home_dir)
+
+    # megabytes the listings of open archives may take
+    if 'TARMAN_MEMORY' in os.environ:
+        Main.memory = int(os.environ['TARMAN_MEMORY']) * 1024 * 1024
+    logging.info("Open archives memory: {0}".format(Main.memory))
+
+    locale.setlocale(locale.LC_ALL, '')  # en_US.UTF-8 ?
+    encoding = locale.getpreferredencoding()
+    logging.info("Encoding: '{0}'".format(encoding))
+
+    app = None
+    profiling.start()
+
+    try:
+
+        # Initialize curses
+        mainscr = curses.initscr()
+        h, w = mainscr.getmaxyx()
+        stdscr = curses.newwin(h - HEADER_LNS, w, HEADER_LNS, 0)
+
+        curses.start_color()
+        curses.use_default_colors()
+
+        # Turn off echoing of keys, and enter cbreak mode,
+        # where no buffering is performed on keyboard input
+        curses.noecho()
+        curses.cbreak()
+
+        # In keypad mode, escape sequences for special keys
+        # (like the cursor keys) will be interpreted and
+        # a special value like curses.key_left will be returned
+        stdscr.keypad(True)
+
+        # scrolling the listing may use the terminal's insert/delete line
+        stdscr.idlok(True)
+
+        # getch will block for 500ms
+        # stdscr.timeout(500)
+
+        # getch will not block
+        # stdscr.nodelay(1)
+
+        app = Main(mainscr, stdscr, arg_directory, encoding)
+        app.loop()   # Enter the main loop
+
+        # Set everything back to normal
+        stdscr.keypad(False)
+        curses.echo()
+        curses.nocbreak()
+        curses.endwin()                 # Terminate curses
+    except:
+        # In the event of an error, restore the terminal
+        # to a sane state.
+        stdscr.keypad(False)
+        curses.echo()
+        curses.nocbreak()
+        curses.endwin()
+        traceback.print_exc()           # Print the exception
+        app.cancel()
+
+    logging.info(app.visited)
+
+    logging.info(str(app.checked))
+    for item in app.checked:
+        logging.info(str(item.get_data_array()))
+
+    profiling.report()
+
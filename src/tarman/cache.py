@@ -0,0 +1,168 @@
+from tarman import lazy
+from tarman.constants import CACHE_SIZE
+from tarman.constants import OPEN_ARCHIVES_SIZE
+
+import collections
+import logging
+import marshal
+import os
+import zlib
+
+hashlib = lazy.module('hashlib')
+tempfile = lazy.module('tempfile')
+
+
+FORMAT_VERSION = 1
+
+
+class ListingCache():
+    """On-disk cache of archive indexes.
+
+    Every archive gets one file named after the hash of its absolute path.
+    The file starts with a marshalled header that holds the format version,
+    the path and the (inode, size, mtime) signature of the archive, followed
+    by the zlib compressed index. Anything that does not match the archive
+    on disk is treated as a miss. Cache files are touched when they are
+    read, the least recently used ones are removed once the directory
+    grows over `size` bytes.
+    """
+
+    def __init__(self, directory, size=CACHE_SIZE):
+        self.directory = directory
+        self.size = size
+
+    def filename(self, path):
+        key = path.encode('utf-8', 'surrogateescape')
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest())
+
+    @staticmethod
+    def signature(path):
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def load(self, path):
+        try:
+            filename = self.filename(path)
+            with open(filename, 'rb') as f:
+                header = marshal.load(f)
+                if header != (FORMAT_VERSION, path, self.signature(path)):
+                    return None
+                index = marshal.loads(zlib.decompress(f.read()))
+            os.utime(filename, None)
+            return index
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                zlib.error):
+            return None
+
+    def store(self, path, index):
+        try:
+            header = (FORMAT_VERSION, path, self.signature(path))
+            data = zlib.compress(marshal.dumps(index), 1)
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmpname = tempfile.mkstemp(prefix='.', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    marshal.dump(header, f)
+                    f.write(data)
+                os.rename(tmpname, self.filename(path))
+            except:
+                os.remove(tmpname)
+                raise
+            self.evict()
+            return True
+        except (IOError, OSError, ValueError):
+            return False
+
+    def evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            filename = os.path.join(self.directory, name)
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, filename))
+
+        total = sum(f[1] for f in files)
+        for mtime, size, filename in sorted(files):
+            if total <= self.size:
+                break
+            try:
+                os.remove(filename)
+                total -= size
+            except OSError:
+                pass
+
+
+class OpenArchives():
+    """Archives that are open, least recently used first.
+
+    Once the footprints of their listings add up to more than `size`
+    bytes, evict closes the least recently used ones. They are opened
+    again when they are needed, from the ListingCache if there is one.
+    """
+
+    def __init__(self, size=OPEN_ARCHIVES_SIZE):
+        self.size = size
+        self.archives = collections.OrderedDict()
+
+    def __contains__(self, archive):
+        return self.archives.get(archive.path) is archive
+
+    def __iter__(self):
+        return iter(list(self.archives.values()))
+
+    def __len__(self):
+        return len(self.archives)
+
+    def add(self, archive):
+        """Add `archive` or mark it as the most recently used one."""
+        self.archives[archive.path] = archive
+        self.archives.move_to_end(archive.path)
+
+    def get(self, path):
+        return self.archives.get(path)
+
+    def discard(self, archive):
+        if archive in self:
+            del self.archives[archive.path]
+
+    def footprint(self):
+        return sum(a.footprint() for a in self.archives.values())
+
+    def evict(self, keep=None):
+        """Close the least recently used archives, except `keep` and the
+        archives it is inside of, until the rest fit into `size` and return
+        the closed ones. Archives inside of a closed one are closed too.
+        """
+        keep = set(id(a) for a in ancestors(keep))
+        total = self.footprint()
+        closed = []
+        for archive in list(self.archives.values()):
+            if total <= self.size:
+                break
+            if id(archive) in keep or archive not in self:
+                continue
+            # members read from a closed archive can not be read anymore
+            for a in list(self.archives.values()):
+                if a is archive or archive in ancestors(a.parent):
+                    total -= a.footprint()
+                    del self.archives[a.path]
+                    a.close()
+                    closed.append(a)
+                    logging.info("Closed '{0}', {1} bytes open".format(
+                        a.path, total
+                    ))
+        return closed
+
+
+def ancestors(archive):
+    """`archive` and the archives it is inside of."""
+    result = []
+    while archive is not None:
+        result.append(archive)
+        archive = getattr(archive, 'parent', None)
+    return result
@@ -0,0 +1,293 @@
+"""Commands that run without the curses browser, for scripts.
+
+    tarman ls [-l | --json] ARCHIVE
+    tarman x [-v] [-C DIR] ARCHIVE [MEMBER ...]
+    tarman c [-v] [-C DIR] OUT PATH [PATH ...]
+    tarman batch [-j N] [--io N] [--json] [-C DIR] ARCHIVE [ARCHIVE ...]
+
+Listings are written while the archive is read. Exit status is 0 on
+success, 1 when an archive could not be read or written or a MEMBER
+was not found, 2 on wrong arguments.
+"""
+from tarman import lazy
+from tarman import profiling
+from tarman.containers import FileSystem
+from tarman.helpers import configure
+from tarman.helpers import get_archive_class
+from tarman.helpers import get_archive_class_by_name
+from tarman.tree import SelectionTree
+
+import argparse
+import fnmatch
+import json
+import os
+import pwd
+import sys
+import tarfile
+import time
+import zipfile
+
+batch = lazy.module('tarman.batch')
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+
+# what reading or writing an archive may raise
+ERRORS = (IOError, OSError, EOFError, tarfile.TarError, zipfile.BadZipFile)
+
+
+def error(message):
+    print("tarman: {0}".format(message), file=sys.stderr)
+
+
+def kind(type):
+    if type == tarfile.DIRTYPE:
+        return 'directory'
+    if type in (tarfile.SYMTYPE, tarfile.LNKTYPE):
+        return 'link'
+    if type in tarfile.REGULAR_TYPES:
+        return 'file'
+    return 'other'
+
+
+def open_class(path):
+    aclass = get_archive_class(path)
+    if aclass is None:
+        error("'{0}' is not an archive".format(path))
+    return aclass
+
+
+def ls(args, out):
+    aclass = open_class(args.archive)
+    if aclass is None:
+        return EXIT_FAILURE
+    for e in aclass.iterentries(os.path.abspath(args.archive)):
+        name, type, size, mode, mtime = e[:5]
+        if args.json:
+            out.write(json.dumps({
+                'name': name, 'type': kind(type), 'size': size,
+                'mode': mode, 'mtime': mtime,
+            }) + '\n')
+        elif args.long:
+            out.write("{0:04o} {1:>12} {2} {3}\n".format(
+                mode or 0, size,
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime or 0)),
+                name
+            ))
+        else:
+            out.write(name + '\n')
+    return EXIT_OK
+
+
+def walk(container):
+    """Yield the path and the name relative to the archive of every entry
+    of `container`, directories before what is in them.
+    """
+    stack = [(container.path, '')]
+    while stack:
+        path, name = stack.pop()
+        if name:
+            yield path, name
+        if container.isenterable(path):
+            for n in sorted(container.listdir(path), reverse=True):
+                stack.append((
+                    container.join(path, n), n if not name else name + '/' + n
+                ))
+
+
+def select(container, patterns):
+    """SelectionTree of the entries of `container` that match one of the
+    glob `patterns` and the patterns that matched nothing.
+    """
+    checked = SelectionTree(container.path, container)
+    patterns = [p.strip('/') for p in patterns]
+    unmatched = set(patterns)
+    for path, name in walk(container):
+        matched = False
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(name, pattern):
+                unmatched.discard(pattern)
+                matched = True
+        # entries in a selected directory are selected with it
+        if matched and path not in checked:
+            checked.add(path)
+    return checked, sorted(unmatched)
+
+
+def x(args, out):
+    aclass = open_class(args.archive)
+    if aclass is None:
+        return EXIT_FAILURE
+    container = aclass(args.archive)
+    try:
+        checked = None
+        status = EXIT_OK
+        if args.members:
+            checked, unmatched = select(container, args.members)
+            for pattern in unmatched:
+                error("'{0}' not found in archive".format(pattern))
+                status = EXIT_FAILURE
+            if status != EXIT_OK:
+                return status
+        if args.verbose:
+            names = [name for path, name in (
+                checked.walk() if checked else walk(container)
+            )]
+            for name in names:
+                out.write(name + '\n')
+        aclass.extract(
+            container, container.archive, args.directory, checked=checked
+        )
+        return status
+    finally:
+        container.close()
+
+
+def c(args, out):
+    aclass = get_archive_class_by_name(args.out)
+    if aclass is None:
+        error("unknown archive format of '{0}'".format(args.out))
+        return EXIT_USAGE
+    out_path = os.path.abspath(args.out)
+
+    container = FileSystem()
+    paths = [
+        os.path.abspath(os.path.join(args.directory, p)) for p in args.paths
+    ]
+    for path in paths:
+        if not os.path.lexists(path):
+            error("'{0}' does not exist".format(path))
+            return EXIT_FAILURE
+    # names in the archive are relative to the common parent directory
+    root = os.path.commonpath([os.path.dirname(p) for p in paths])
+    checked = SelectionTree(root, container)
+    for path in paths:
+        checked.add(path)
+
+    if args.verbose:
+        for path, name in checked.walk():
+            out.write(name + '\n')
+    if not aclass.create(container, out_path, checked):
+        error("could not create '{0}'".format(out_path))
+        return EXIT_FAILURE
+    return EXIT_OK
+
+
+def megabytes(size):
+    return size / 1024.0 / 1024.0
+
+
+def extract_batch(args, out):
+    paths = batch.expand(args.archives)
+    if not paths:
+        error("no archives")
+        return EXIT_FAILURE
+
+    def done(entry):
+        if args.json:
+            return
+        if entry['error'] is None:
+            out.write("ok     {0:>10.1f} MB {1:>8.2f} s  {2} -> {3}\n".format(
+                megabytes(entry['bytes']), entry['seconds'],
+                entry['archive'], entry['target']
+            ))
+        else:
+            out.write("FAILED {0}: {1}\n".format(
+                entry['archive'], entry['error']
+            ))
+        out.flush()
+
+    report = batch.extract(
+        paths, os.path.abspath(args.directory), processes=args.jobs,
+        io=args.io, done=done
+    )
+    if args.json:
+        out.write(json.dumps(report, indent=2) + '\n')
+    else:
+        out.write(
+            "{0} extracted, {1} failed, {2:.1f} MB in {3:.2f} s, "
+            "{4:.1f} MB/s on {5} processes x {6} threads\n".format(
+                report['extracted'], report['failed'],
+                megabytes(report['bytes']), report['seconds'],
+                megabytes(report['throughput']), report['processes'],
+                report['threads']
+            )
+        )
+    return EXIT_OK if report['failed'] == 0 else EXIT_FAILURE
+
+
+def parser():
+    p = argparse.ArgumentParser(
+        prog='tarman', description="Archives without the browser."
+    )
+    commands = p.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+
+    p_ls = commands.add_parser('ls', help="list the members of an archive")
+    p_ls.add_argument('archive')
+    p_ls.add_argument('-l', dest='long', action='store_true',
+                      help="mode, size and mtime before names")
+    p_ls.add_argument('--json', action='store_true',
+                      help="one JSON object per member")
+    p_ls.set_defaults(run=ls)
+
+    p_x = commands.add_parser('x', help="extract an archive")
+    p_x.add_argument('archive')
+    p_x.add_argument('members', nargs='*', metavar='MEMBER',
+                     help="names or glob patterns of members to extract")
+    p_x.add_argument('-C', dest='directory', default='.',
+                     help="directory to extract to")
+    p_x.add_argument('-v', dest='verbose', action='store_true')
+    p_x.set_defaults(run=x)
+
+    p_c = commands.add_parser(
+        'c', help="create an archive, the format follows from its extension"
+    )
+    p_c.add_argument('out')
+    p_c.add_argument('paths', nargs='+', metavar='PATH')
+    p_c.add_argument('-C', dest='directory', default='.',
+                     help="directory PATHs are relative to")
+    p_c.add_argument('-v', dest='verbose', action='store_true')
+    p_c.set_defaults(run=c)
+
+    p_batch = commands.add_parser(
+        'batch', help="extract many archives at once, each into a "
+        "directory named after it"
+    )
+    p_batch.add_argument('archives', nargs='+', metavar='ARCHIVE',
+                         help="paths or glob patterns of archives")
+    p_batch.add_argument('-C', dest='directory', default='.',
+                         help="directory to extract to")
+    p_batch.add_argument('-j', dest='jobs', type=int, default=None,
+                         help="worker processes, one per CPU by default")
+    p_batch.add_argument('--io', type=int, default=None,
+                         help="files read and written at the same time, "
+                         "as many as worker processes by default")
+    p_batch.add_argument('--json', action='store_true',
+                         help="write the report as JSON")
+    p_batch.set_defaults(run=extract_batch)
+    return p
+
+
+def main(argv, out=None):
+    """Run the command of `argv` and return its exit status."""
+    out = out or sys.stdout
+    try:
+        args = parser().parse_args(argv)
+    except SystemExit as e:
+        return e.code
+    configure(pwd.getpwuid(os.getuid()).pw_dir)
+    profiling.start()
+    try:
+        return args.run(args, out)
+    except BrokenPipeError:
+        # the reader of a listing went away, like `tarman ls a.tar | head`
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_FAILURE
+    except ERRORS as e:
+        error(e)
+        return EXIT_FAILURE
+    finally:
+        # there is no log to write to, see --profile
+        profiling.report(sys.stderr)
@@ -0,0 +1,355 @@
+"""Archive listings stored as columns instead of node objects.
+
+ColumnTree keeps one row per entry in parallel arrays: parent row, name id,
+type, size, compressed size, mode, mtime, header offset and the totals of
+update_totals. Names are interned, so repeated names (every `__init__.py`,
+every `Makefile`) are stored once, UTF-8 encoded in one buffer. Entries
+are only turned into objects, ColumnNode proxies and MemberInfo, when
+they are asked for, which keeps listings of millions of members at a
+fraction of the memory of DirectoryTree while offering the same methods
+to the containers.
+"""
+from tarman import profiling
+from tarman.constants import DIRCACHE_SIZE
+from tarman.exceptions import OutOfRange
+from tarman.tree import LEAVES
+from tarman.tree import traverse
+
+import array
+import collections
+import gc
+import tarfile
+
+
+DIRTYPE = tarfile.DIRTYPE[0]
+# type 0 marks implicit parent directories, old tar archives have it as
+# the type of regular files
+AREGTYPE = tarfile.AREGTYPE[0]
+REGTYPE = tarfile.REGTYPE[0]
+
+
+class ColumnNode():
+    """Proxy of one row of a ColumnTree, made on demand."""
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def data(self):
+        return self.tree.name(self.index)
+
+    @property
+    def parent(self):
+        parent = self.tree.parents[self.index]
+        return ColumnNode(self.tree, parent) if parent >= 0 else None
+
+    @property
+    def children(self):
+        return [ColumnNode(self.tree, i) for i in self.tree.rows(self.index)]
+
+    @property
+    def info(self):
+        return self.tree.info(self.index)
+
+    @property
+    def count(self):
+        return self.tree.count[self.index]
+
+    @property
+    def size(self):
+        return self.tree.tsize[self.index]
+
+    @property
+    def csize(self):
+        return self.tree.tcsize[self.index]
+
+    def get_child(self, data):
+        child = self.tree.lookup(self.index).get(data)
+        return ColumnNode(self.tree, child) if child is not None else None
+
+    def get_children_data(self):
+        return [self.tree.name(i) for i in self.tree.rows(self.index)]
+
+    def get_path(self):
+        return self.tree.container.join(
+            self.tree.root_dir, *self.tree.relative(self.index)
+        ) if self.index else self.tree.root_dir
+
+    def is_dir(self):
+        return self.tree.container.isenterable(self.get_path())
+
+    def del_self(self):
+        self.tree.remove(self.index)
+
+    def __eq__(self, node):
+        return isinstance(node, ColumnNode) and node.tree is self.tree \
+            and node.index == self.index
+
+    def __str__(self):
+        return self.data
+
+
+class ColumnTree():
+    """DirectoryTree replacement for archives with many members.
+
+    Rows of parents always come before rows of their children. Children of
+    a directory are kept as an array of rows, a name lookup dictionary is
+    only made for directories that are looked into, and only for the last
+    DIRCACHE_SIZE of them.
+    """
+
+    def __init__(self, root_dir, container):
+        # containers imports this module
+        from tarman.containers import MemberInfo
+        self.memberinfo = MemberInfo
+        self.root_dir = root_dir
+        self.container = container
+        self.root_array = self._split(root_dir)
+
+        # name id -> name: self.strings[starts[id]:starts[id + 1]]
+        self.strings = bytearray()
+        self.starts = array.array('q', [0])
+        self.intern(root_dir)
+        self.parents = array.array('i', [-1])
+        self.names = array.array('i', [0])
+        self.types = bytearray(1)
+        self.sizes = array.array('q', [0])
+        self.csizes = array.array('q', [0])
+        self.modes = array.array('i', [0])
+        self.mtimes = array.array('d', [0])
+        self.offsets = array.array('q', [0])
+        self.count = array.array('i', [0])
+        self.tsize = array.array('q', [0])
+        self.tcsize = array.array('q', [0])
+        # row -> array of child rows, for directories only
+        self.childrows = {}
+        # row -> {name: child row}, least recently used first
+        self.lookups = collections.OrderedDict()
+        self.root = ColumnNode(self, 0)
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __iter__(self):
+        """Yield the nodes without children."""
+        if self.childrows.get(0):
+            for node in traverse(
+                    self.root, lambda node: node.children, LEAVES):
+                yield node
+
+    def _split(self, path):
+        result = []
+        prefix, name = self.container.split(path)
+        while name:
+            result.append(name)
+            prefix, name = self.container.split(prefix)
+        result.reverse()
+        return result
+
+    def _get_relative_array(self, path):
+        path_array = self._split(path)
+        len_main = len(self.root_array)
+
+        if len_main > len(path_array) or \
+                path_array[:len_main] != self.root_array:
+            raise OutOfRange(path)
+
+        return path_array[len_main:]
+
+    def rows(self, row):
+        return self.childrows.get(row) or array.array('i')
+
+    def intern(self, name):
+        self.strings += name.encode('utf-8', 'surrogateescape')
+        self.starts.append(len(self.strings))
+        return len(self.starts) - 2
+
+    def name(self, row):
+        i = self.names[row]
+        return self.strings[self.starts[i]:self.starts[i + 1]].decode(
+            'utf-8', 'surrogateescape'
+        )
+
+    def relative(self, row):
+        result = []
+        while row > 0:
+            result.append(self.name(row))
+            row = self.parents[row]
+        result.reverse()
+        return result
+
+    def lookup(self, row):
+        names = self.lookups.get(row)
+        if names is not None:
+            self.lookups.move_to_end(row)
+            return names
+        names = dict((self.name(i), i) for i in self.rows(row))
+        self.lookups[row] = names
+        while len(self.lookups) > DIRCACHE_SIZE:
+            self.lookups.popitem(last=False)
+        return names
+
+    def info(self, row):
+        t = self.types[row]
+        if not t:
+            return None  # implicit parent directory
+        return self.memberinfo(
+            '/'.join(self.relative(row)), bytes((t, )), self.sizes[row],
+            self.modes[row], self.mtimes[row], self.offsets[row],
+            csize=self.csizes[row]
+        )
+
+    def append(self, parent, name, type=0, size=0, csize=0, mode=0,
+               mtime=0, offset=0):
+        row = len(self.parents)
+        self.parents.append(parent)
+        self.names.append(name)
+        self.types.append(type)
+        self.sizes.append(size)
+        self.csizes.append(csize)
+        self.modes.append(mode)
+        self.mtimes.append(mtime)
+        self.offsets.append(offset)
+        self.count.append(0)
+        self.tsize.append(0)
+        self.tcsize.append(0)
+        rows = self.childrows.get(parent)
+        if rows is None:
+            rows = self.childrows[parent] = array.array('i')
+        rows.append(row)
+        return row
+
+    @profiling.timed('tree.add')
+    def add_entries(self, entries, sep='/'):
+        """Add (name, type, size, mode, mtime, offset[, csize]) tuples of
+        archive members, names relative to root_dir, in one sweep. Parent
+        directories are added implicitly, a later entry of the same name
+        replaces the earlier one.
+        """
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._add_entries(entries, sep)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.lookups.clear()
+
+    def _add_entries(self, entries, sep):
+        # only needed while the rows are added: interned name -> name id
+        # and member path -> row
+        ids = {}
+        known = {}
+        append = self.append
+        intern = self.intern
+        for e in entries:
+            parts = [p for p in e[0].split(sep) if p]
+            if not parts:
+                continue
+            key = sep.join(parts)
+            t = e[1][0]
+            if t == AREGTYPE:
+                t = REGTYPE
+            size = e[2]
+            csize = e[6] if len(e) > 6 and e[6] is not None else size
+            mode = e[3] or 0
+            mtime = e[4] or 0
+            row = known.get(key)
+            if row is not None:
+                self.types[row] = t
+                self.sizes[row] = size
+                self.csizes[row] = csize
+                self.modes[row] = mode
+                self.mtimes[row] = mtime
+                self.offsets[row] = e[5]
+                continue
+
+            # deepest parent already there, usually the direct one
+            last = len(parts) - 1
+            i = last
+            parent = None
+            while i > 0:
+                parent = known.get(sep.join(parts[:i]))
+                if parent is not None:
+                    break
+                i -= 1
+            if parent is None:
+                parent = 0
+            for i in range(i, last):
+                name = ids.get(parts[i])
+                if name is None:
+                    name = ids[parts[i]] = intern(parts[i])
+                parent = append(parent, name)
+                known[sep.join(parts[:i + 1])] = parent
+            name = ids.get(parts[last])
+            if name is None:
+                name = ids[parts[last]] = intern(parts[last])
+            known[key] = append(
+                parent, name, t, size, csize, mode, mtime, e[5]
+            )
+
+    @profiling.timed('tree.totals')
+    def update_totals(self):
+        """Set count, size and csize of every node to the number of files
+        in its subtree and the sum of their sizes.
+        """
+        count = self.count
+        tsize = self.tsize
+        tcsize = self.tcsize
+        parents = self.parents
+        types = self.types
+        for row in range(len(parents)):
+            t = types[row]
+            if t and t != DIRTYPE:
+                count[row] = 1
+                tsize[row] = self.sizes[row]
+                tcsize[row] = self.csizes[row]
+            else:
+                count[row] = tsize[row] = tcsize[row] = 0
+        # children come after their parents
+        for row in range(len(parents) - 1, 0, -1):
+            parent = parents[row]
+            if parent < 0:
+                continue  # removed
+            count[parent] += count[row]
+            tsize[parent] += tsize[row]
+            tcsize[parent] += tcsize[row]
+
+    def listdir(self, path):
+        return self[path].get_children_data()
+
+    def add(self, path, sub=False):
+        row = 0
+        for name in self._get_relative_array(path):
+            child = self.lookup(row).get(name)
+            if child is None:
+                child = self.append(row, self.intern(name))
+                self.lookups.pop(row, None)
+            row = child
+        return ColumnNode(self, row)
+
+    def remove(self, row):
+        parent = self.parents[row]
+        if parent < 0:
+            return
+        self.childrows[parent].remove(row)
+        self.lookups.pop(parent, None)
+        self.parents[row] = -2
+
+    def __contains__(self, path):
+        return self[path] is not None
+
+    @profiling.timed('lookup')
+    def __getitem__(self, path):
+        row = 0
+        for name in self._get_relative_array(path):
+            row = self.lookup(row).get(name)
+            if row is None:
+                return None
+        return ColumnNode(self, row)
+
+    def __delitem__(self, path):
+        self[path].del_self()
@@ -1,6 +1,30 @@
 
+VERSION = "0.1.3"
+# subcommands of tarman.cli
+COMMANDS = ('ls', 'x', 'c', 'batch')
 HEADER_LNS = 1
-ITEMS_WARNING = 10000
+CACHE_SIZE = 256 * 1024 * 1024
+CHECKPOINT_SPAN = 4 * 1024 * 1024
+COMPRESS_BLOCK = 1024 * 1024
+DIRCACHE_SIZE = 128
+COLUMNAR_ENTRIES = 100000
+SNIFF_SIZE = 4096
+SNIFF_CACHE_SIZE = 1024
+SCAN_BATCH = 10000
+SCAN_INTERVAL = 0.1
+SCAN_POLL = 100
+OPEN_ARCHIVES_SIZE = 512 * 1024 * 1024
+# archives inside of archives that can not seek are copied to a temporary
+# file, in memory up to SPOOL_MEMORY bytes
+SPOOL_MEMORY = 16 * 1024 * 1024
+SPOOL_SIZE = 4 * 1024 * 1024 * 1024
+# approximate bytes per listed member, see Archive.footprint
+NODE_BYTES = 350
+ROW_BYTES = 90
+TARINFO_BYTES = 450
+ZIPINFO_BYTES = 75
+# entry of the header offset lookup of Zip.getmember
+LOOKUP_BYTES = 100
 HELP_STRING = """Browser window key bindings:
   - c              - create archive from selected files
   - e              - extract selected files
@@ -10,6 +34,7 @@ HELP_STRING = """Browser window key bindings:
   - RIGHT/ENTER    - go in to directory or archive
   - SPACE          - select and unselect files
   - UP/DOWN        - move up or down in browser
+  - ESC            - stop opening an archive that is still read
 
 Overlay window key bindings:
   - ENTER          - confirm/ok
@@ -1,10 +1,90 @@
+import collections
+import io
 import os
-import tarfile
-import zipfile
-
+import threading
+import time
+import zlib
+
+from tarman import lazy
+from tarman import profiling
+from tarman.constants import COLUMNAR_ENTRIES
+from tarman.constants import DIRCACHE_SIZE
+from tarman.constants import LOOKUP_BYTES
+from tarman.constants import NODE_BYTES
+from tarman.constants import ROW_BYTES
+from tarman.constants import SCAN_BATCH
+from tarman.constants import SCAN_INTERVAL
+from tarman.constants import SNIFF_SIZE
+from tarman.constants import SPOOL_MEMORY
+from tarman.constants import SPOOL_SIZE
+from tarman.constants import TARINFO_BYTES
+from tarman.constants import ZIPINFO_BYTES
 from tarman.exceptions import NotImplemented
 from tarman.tree import DirectoryTree
 
+# format backends, imported once an archive is used
+bz2 = lazy.module('bz2')
+columnar = lazy.module('tarman.columnar')
+gzip = lazy.module('gzip')
+libarchive = lazy.module('tarman.libarchive')
+lzma = lazy.module('lzma')
+parallel = lazy.module('tarman.parallel')
+seekable = lazy.module('tarman.seekable')
+shutil = lazy.module('shutil')
+tarfile = lazy.module('tarfile')
+tempfile = lazy.module('tempfile')
+zipfile = lazy.module('zipfile')
+
+
+# Archive classes get_archive_class tries, in order, see register
+ARCHIVES = []
+
+
+def register(cls):
+    """Class decorator adding an Archive class to ARCHIVES."""
+    ARCHIVES.append(cls)
+    return cls
+
+
+def ondisk(fileobj):
+    """Whether `fileobj` reads a file of its own, one that workers can open
+    again by its name, and not a member of another archive.
+    """
+    return type(fileobj) is io.BufferedReader
+
+
+def member_file(stream, size, cheap, accept=None):
+    """Return `stream`, a member of `size` bytes, as a file object that
+    seeks cheaply: `stream` itself if `cheap`, else a copy in a temporary
+    file, kept in memory up to SPOOL_MEMORY bytes. Members over SPOOL_SIZE
+    bytes are not copied and None is returned, as it is when `accept` is
+    false for the first SNIFF_SIZE bytes, before anything is copied.
+    """
+    out = None
+    try:
+        head = b''
+        if accept is not None:
+            head = stream.read(SNIFF_SIZE)
+            if not accept(head):
+                return None
+        if cheap:
+            stream.seek(0)
+            result, stream = stream, None
+            return result
+        if size > SPOOL_SIZE:
+            return None
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+        out.write(head)
+        shutil.copyfileobj(stream, out, 1024 * 1024)
+        out.seek(0)
+        result, out = out, None
+        return result
+    finally:
+        if stream is not None:
+            stream.close()
+        if out is not None:
+            out.close()
+
 
 class Container():
 
@@ -14,6 +94,12 @@ class Container():
     def isenterable(self, path):
         raise NotImplemented()
 
+    def islink(self, path):
+        """Whether `path` is a symbolic link, which is archived as such and
+        not by what it points to.
+        """
+        return False
+
     def abspath(self, path):
         raise NotImplemented()
 
@@ -34,6 +120,9 @@ class Container():
     def samefile(self, f1, f2):
         return f1.lower() == f2.lower()
 
+    def getsize(self, path):
+        return None
+
     def count_items(self, path, stop_at=-1):
         count = 0
         if self.isenterable(path):
@@ -46,33 +135,258 @@ class Container():
 
 class Archive():
 
-    def __init__(self, path):
+    # tarman.cache.ListingCache shared by all archives, None disables it
+    cache = None
+    # number of threads extract and create use where they can
+    workers = 1
+    # file name extensions create recognizes
+    extensions = ()
+    # Scan while members are still read in the background, see poll
+    scan = None
+    # exception that ended the background scan early
+    error = None
+    # number of members in the listing, see footprint
+    length = 0
+    # Archive this one is a member of and the stream it is read from
+    parent = None
+    stream = None
+
+    def __init__(self, path, background=False, fileobj=None, parent=None):
+        """Open the archive at `path`. Archives inside of another one, the
+        `parent`, are read from the file object `fileobj` of the member at
+        `path` instead, see openmember.
+        """
+        raise NotImplemented()
+
+    def poll(self):
+        """Add the members a background scan read since the last call to
+        the tree and return how many there were.
+        """
+        return 0
+
+    def close(self):
+        """Close the archive and let go of its listing."""
+        self.archive.close()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.archive = None
+        self.tree = None
+
+    def openmember(self, path, accept=None):
+        """Seekable file object of the member at `path`, see member_file,
+        None if it has no data.
+        """
         raise NotImplemented()
 
+    def footprint(self):
+        """Approximate number of bytes the listing of the archive takes."""
+        if self.tree is None:
+            return 0
+        if isinstance(self.tree, columnar.ColumnTree):
+            return len(self.tree) * ROW_BYTES
+        return self.length * NODE_BYTES
+
+    @profiling.timed('tree.load')
+    def load_tree(self, entries, members=None):
+        """Set self.tree to the listing of `entries`, (name, type, size,
+        mode, mtime, offset[, csize]) tuples, and `members`, the matching
+        TarInfo/ZipInfo objects if there are any. Listings of
+        COLUMNAR_ENTRIES or more are stored in a ColumnTree.
+        """
+        self.length = len(entries)
+        if len(entries) >= COLUMNAR_ENTRIES:
+            self.tree = columnar.ColumnTree(self.path, self)
+            self.tree.add_entries(entries)
+        else:
+            self.tree = DirectoryTree(self.path, self)
+            nodes = self.tree.add_many(e[0] for e in entries)
+            for node, e, m in zip(nodes, entries,
+                                  members or [None] * len(entries)):
+                node.info = MemberInfo(*e, member=m)
+        self.tree.update_totals()
+
     @staticmethod
     def isarchive(path):
         raise NotImplemented()
 
     @staticmethod
-    def open(path):
+    def sniff(header, path):
+        """Whether the file at `path`, which starts with the bytes `header`,
+        is an archive of this class. Should not read the file again unless
+        the header can not tell. `path` is a file object for members of
+        archives.
+        """
+        raise NotImplemented()
+
+    @staticmethod
+    def open(path, fileobj=None):
         raise NotImplemented()
 
     @staticmethod
-    def extract(container, archive, target_path, checked=None):
+    def iterentries(path):
+        """Yield the (name, type, size, mode, mtime, offset[, csize])
+        tuples of the members of the archive at `path` while they are read.
+        """
+        raise NotImplemented()
+
+    @staticmethod
+    def extract(container, archive, target_path, checked=None,
+                workers=None):
+        raise NotImplemented()
+
+    @staticmethod
+    def create(container, archive_path, checked, workers=None):
         raise NotImplemented()
 
 
+class Scan():
+    """Reads the members of an archive on a thread.
+
+    They are handed over in batches, at least every SCAN_INTERVAL seconds,
+    so the first ones can be shown while the rest is still being read.
+    The tree is only ever changed by the thread calling take.
+
+    A cancelled scan is not waited for, reading past a member of a large
+    compressed archive may take long. The thread ends after the member it
+    reads and only then calls the function that releases the archive.
+    """
+
+    def __init__(self, members):
+        self.members = members
+        self.batches = collections.deque()
+        self.cancelled = False
+        self.done = False
+        self.error = None
+        self.release = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        batch = []
+        published = 0
+        try:
+            for member in self.members:
+                if self.cancelled:
+                    break
+                batch.append(member)
+                if len(batch) >= SCAN_BATCH or \
+                        time.time() - published >= SCAN_INTERVAL:
+                    self.batches.append(batch)
+                    batch = []
+                    published = time.time()
+        except Exception as e:  # a damaged archive, reported by poll
+            self.error = e
+        finally:
+            if batch and not self.cancelled:
+                self.batches.append(batch)
+            with self.lock:
+                self.done = True
+                release = self.release
+            if release is not None:
+                release()
+
+    def take(self):
+        result = []
+        while self.batches:
+            result += self.batches.popleft()
+        return result
+
+    def cancel(self, release=None):
+        """Stop reading and call `release` once the thread is done with
+        the archive, at once if it is.
+        """
+        with self.lock:
+            self.cancelled = True
+            if not self.done:
+                self.release = release
+                release = None
+        self.batches.clear()
+        if release is not None:
+            release()
+
+
+class MemberInfo():
+    """Metadata of one archive member, stored on its tree node.
+    `type` is one of the tarfile type codes, `offset` is where the member's
+    header starts in the archive. `csize` is the compressed size where the
+    format has one and `size` otherwise. `member` is the TarInfo/ZipInfo
+    the archive module returned for it, or None when the index was loaded
+    from the listing cache.
+    """
+
+    __slots__ = (
+        'name', 'type', 'size', 'mode', 'mtime', 'offset', 'csize', 'member'
+    )
+
+    def __init__(self, name, type, size, mode, mtime, offset, csize=None,
+                 member=None):
+        self.name = name
+        self.type = type
+        self.size = size
+        self.mode = mode
+        self.mtime = mtime
+        self.offset = offset
+        self.csize = size if csize is None else csize
+        self.member = member
+
+    def isdir(self):
+        return self.type == tarfile.DIRTYPE
+
+
 class FileSystem(Container):
 
+    def __init__(self):
+        # path -> (mtime of the directory, {name: os.DirEntry}), the most
+        # recently listed directories last
+        self.dircache = collections.OrderedDict()
+
+    def scandir(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.dircache.get(path)
+        if cached is not None and cached[0] == mtime:
+            self.dircache.move_to_end(path)
+            return cached[1]
+
+        entries = collections.OrderedDict()
+        with os.scandir(path) as it:
+            for entry in it:
+                entries[entry.name] = entry
+        self.dircache[path] = (mtime, entries)
+        while len(self.dircache) > DIRCACHE_SIZE:
+            self.dircache.popitem(last=False)
+        return entries
+
+    @profiling.timed('listdir')
     def listdir(self, path):
         try:
-            return os.listdir(path)
+            return list(self.scandir(path))
         except OSError:
             return []
 
     def isenterable(self, path):
+        # DirEntry keeps the file type from the directory listing, so rows
+        # of a listed directory cost no stat call
+        cached = self.dircache.get(os.path.dirname(path))
+        if cached is not None:
+            entry = cached[1].get(os.path.basename(path))
+            if entry is not None:
+                try:
+                    return entry.is_dir()
+                except OSError:
+                    return False
         return os.path.isdir(path)
 
+    def islink(self, path):
+        cached = self.dircache.get(os.path.dirname(path))
+        if cached is not None:
+            entry = cached[1].get(os.path.basename(path))
+            if entry is not None:
+                return entry.is_symlink()
+        return os.path.islink(path)
+
     def abspath(self, path):
         return os.path.abspath(path)
 
@@ -106,92 +420,554 @@ class FileSystem(Container):
         return n
 
 
+def istarheader(block):
+    if len(block) < tarfile.BLOCKSIZE:
+        return False
+    try:
+        chksum = tarfile.nti(block[148:156])
+    except tarfile.HeaderError:
+        return False
+    return chksum in tarfile.calc_chksums(block)
+
+
+@register
 class Tar(Container, Archive):
 
-    def __init__(self, path):
+    extensions = (
+        '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz'
+    )
+
+    @profiling.timed('open', size=lambda args, result:
+                 profiling.filesize(args[0].path))
+    def __init__(self, path, background=False, fileobj=None, parent=None):
         self.path = os.path.abspath(path)
-        self.archive = Tar.open(self.path)
-        self.tree = DirectoryTree(self.path, self)
-        names = self.archive.getnames()
-        for n in names:
-            self.tree.add(os.path.join(self.path, n))
+        self.parent = parent
+        self.stream = fileobj
+        self.archive = Tar.open(self.path, fileobj)
+
+        self.reader = self.archive.fileobj
+        if not isinstance(self.reader, seekable.Reader):
+            self.reader = None
+
+        # members are not in the cache, only files have a signature
+        index = Archive.cache.load(self.path) \
+            if Archive.cache and parent is None else None
+        if index is None and background and parent is None:
+            # members are added to the tree as poll finds them read
+            self.tree = DirectoryTree(self.path, self)
+            self.entries = []
+            self.scan = Scan(self.archive)
+            return
+
+        if index is None:
+            members = self.archive.getmembers()
+            entries = [Tar.entry(m) for m in members]
+            self.store(entries)
+        else:
+            entries = index['members']
+            members = None
+            if self.reader:
+                self.reader.import_checkpoints(index.get('checkpoints', []))
+
+        self.load_tree(entries, members)
 
+    @staticmethod
+    def entry(member):
+        m = member
+        return (m.name, m.type, m.size, m.mode, m.mtime, m.offset)
+
+    def store(self, entries):
+        if Archive.cache and self.parent is None:
+            Archive.cache.store(self.path, {
+                'members': entries,
+                'checkpoints':
+                    self.reader.export_checkpoints() if self.reader else [],
+            })
+
+    @profiling.timed('tree.poll')
+    def poll(self):
+        if self.scan is None:
+            return 0
+        done = self.scan.done
+        members = self.scan.take()
+        if members:
+            entries = [Tar.entry(m) for m in members]
+            nodes = self.tree.add_many(e[0] for e in entries)
+            for node, e, m in zip(nodes, entries, members):
+                node.info = MemberInfo(*e, member=m)
+            self.entries += entries
+            self.length = len(self.entries)
+
+        if done:
+            self.error = self.scan.error
+            self.scan = None
+            if self.error is None:
+                self.store(self.entries)
+            if len(self.entries) >= COLUMNAR_ENTRIES:
+                self.load_tree(self.entries)
+            else:
+                self.tree.update_totals()
+            self.entries = None
+        return len(members)
+
+    def close(self):
+        # tarfile leaves file objects it was given open
+        files = [
+            f for f in (self.archive, self.reader, self.stream)
+            if f is not None
+        ]
+        scan = self.scan
+        self.scan = self.entries = self.reader = self.stream = None
+        self.archive = self.tree = None
+
+        def release():
+            for f in files:
+                f.close()
+        if scan is not None:
+            scan.cancel(release)
+        else:
+            release()
+
+    def footprint(self):
+        if self.archive is None:
+            return 0
+        # tarfile keeps every TarInfo it has read
+        return Archive.footprint(self) + \
+            len(self.archive.members) * TARINFO_BYTES
+
+    @profiling.timed('listdir')
     def listdir(self, path):
-        children = self.tree[path].children
-        return [c.data for c in children]
+        return self.tree[path].get_children_data()
 
     def isenterable(self, path):
-        arr = self.tree[path].get_data_array()[1:]
-        return self.archive.getmember(os.sep.join(arr)).isdir()
+        info = self.tree[path].info
+        # nodes without info are implicit parent directories
+        return info.isdir() if info is not None else True
 
     def abspath(self, path):
         return self.tree[path].get_path()
 
+    def count_items(self, path, stop_at=-1):
+        return self.tree[path].count
+
+    def getsize(self, path):
+        if self.scan is not None:
+            return None  # totals are summed up once all members are read
+        return self.tree[path].size
+
+    @profiling.timed('lookup.member')
+    def getmember(self, info):
+        if info.member is None:
+            # parse the header at its recorded offset instead of letting
+            # tarfile scan the whole archive
+            self.archive.fileobj.seek(info.offset)
+            self.archive.offset = info.offset
+            info.member = tarfile.TarInfo.fromtarfile(self.archive)
+        return info.member
+
+    def openmember(self, path, accept=None):
+        member = self.getmember(self.tree[path].info)
+        stream = self.archive.extractfile(member)
+        if stream is None:
+            return None
+        # these seek back by decompressing again from the start
+        cheap = not isinstance(
+            self.archive.fileobj, (bz2.BZ2File, gzip.GzipFile, lzma.LZMAFile)
+        )
+        return member_file(stream, member.size, cheap, accept)
+
     @staticmethod
     def isarchive(path):
         return tarfile.is_tarfile(path)
 
     @staticmethod
-    def open(path):
-        return tarfile.open(path)
+    def sniff(header, path):
+        # the first tar header is decompressed from the header buffer
+        try:
+            if header.startswith(seekable.GZIP_MAGIC):
+                block = zlib.decompressobj(31).decompress(
+                    header, tarfile.BLOCKSIZE
+                )
+            elif header.startswith(seekable.XZ_MAGIC):
+                block = lzma.LZMADecompressor().decompress(
+                    header, tarfile.BLOCKSIZE
+                )
+            elif header.startswith(b'BZh'):
+                # bzip2 only outputs whole blocks of up to 900K
+                return tarfile.is_tarfile(path)
+            else:
+                block = header
+        except (zlib.error, lzma.LZMAError):
+            return False
+        return istarheader(block[:tarfile.BLOCKSIZE])
+
+    @staticmethod
+    def open(path, fileobj=None):
+        # gzip and xz are read through checkpointing readers, so members
+        # can be extracted without decompressing everything before them
+        reader = seekable.open(path, fileobj=fileobj)
+        if reader is None:
+            return tarfile.open(path, fileobj=fileobj)
+        try:
+            return tarfile.open(fileobj=reader, mode='r:')
+        except:
+            reader.close()
+            raise
 
     @staticmethod
-    def extract(container, archive, target_path, checked=None):
+    def iterentries(path):
+        index = Archive.cache.load(path) if Archive.cache else None
+        if index is not None:
+            for e in index['members']:
+                yield e
+            return
+        archive = Tar.open(path)
+        try:
+            for m in archive:
+                yield Tar.entry(m)
+        finally:
+            archive.close()
+
+    @staticmethod
+    @profiling.timed('extract', size=lambda args, result:
+                     profiling.filesize(args[1].name or ''))
+    def extract(container, archive, target_path, checked=None,
+                workers=None):
         if checked:
             members = []
-            for node in checked:
-                # without root data
-                arr = container.tree[node.get_path()].get_data_array()[1:]
-                if arr[0] == '..':
+            for path, arcname in checked.walk():
+                info = container.tree[path].info
+                if info is None:
                     continue
-                members += [archive.getmember(os.sep.join(arr))]
+                members += [container.getmember(info)]
         else:
             members = None
-        archive.extractall(path=target_path, members=members)
 
+        workers = workers or Archive.workers
+        # only plain tar files have members at fixed offsets on disk
+        if workers > 1 and ondisk(archive.fileobj):
+            if members is None:
+                members = archive.getmembers()
+            regular = []
+            special = []
+            for m in members:
+                if m.isdir() or (m.isreg() and not m.issparse()):
+                    regular += [(m.name, m.isdir(), m.mode, m.mtime, m)]
+                else:
+                    special += [m]
+            parallel.extract(
+                parallel.TarSource(archive.name), regular, target_path,
+                workers, special=special,
+                extract_special=lambda m: archive.extract(m, target_path)
+            )
+        else:
+            archive.extractall(path=target_path, members=members)
+
+    @staticmethod
+    @profiling.timed('create', size=lambda args, result:
+                     profiling.filesize(args[1]))
+    def create(container, archive_path, checked, workers=None):
+        workers = workers or Archive.workers
+        name = archive_path.lower()
+        gzipped = name.endswith(('.tar.gz', '.tgz'))
+        if name.endswith(('.tar.bz2', '.tbz2')):
+            mode = 'w:bz2'
+        elif name.endswith(('.tar.xz', '.txz')):
+            mode = 'w:xz'
+        else:
+            mode = 'w'
 
+        fileobj = None
+        try:
+            if gzipped:
+                # gzip blocks are compressed on all workers
+                fileobj = parallel.GzipWriter(archive_path, workers)
+            with tarfile.open(archive_path, mode, fileobj=fileobj) as tar:
+                for path, arcname in checked.walk():
+                    tar.add(path, arcname=arcname, recursive=False)
+            if fileobj:
+                # writes the blocks that are still being compressed
+                fileobj.close()
+        except (IOError, OSError, tarfile.TarError):
+            if fileobj:
+                try:
+                    fileobj.close()
+                except (IOError, OSError):
+                    pass
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
+            return False
+        finally:
+            # closing twice does nothing
+            if fileobj:
+                fileobj.close()
+        return True
+
+
+@register
 class Zip(Container, Archive):
 
-    def __init__(self, path):
+    extensions = ('.zip', )
+    # header offset -> ZipInfo, see getmember
+    offsets = None
+
+    @profiling.timed('open', size=lambda args, result:
+                 profiling.filesize(args[0].path))
+    def __init__(self, path, background=False, fileobj=None, parent=None):
+        # the central directory is read at once, there is nothing to scan
         self.path = os.path.abspath(path)
-        self.archive = Zip.open(self.path)
-        self.tree = DirectoryTree(self.path, self)
-        names = self.archive.namelist()
-        for n in names:
-            if n[-1] == os.sep:
-                continue
-            self.tree.add(os.path.join(self.path, n))
+        self.parent = parent
+        self.stream = fileobj
+        self.archive = Zip.open(self.path, fileobj)
+        members = self.archive.infolist()
+        self.load_tree([Zip.entry(m) for m in members], members)
 
+    @staticmethod
+    def entry(member):
+        m = member
+        return (
+            m.filename,
+            tarfile.DIRTYPE if m.is_dir() else tarfile.REGTYPE,
+            m.file_size,
+            Zip.mode(m),
+            Zip.mtime(m),
+            m.header_offset,
+            m.compress_size
+        )
+
+    @profiling.timed('listdir')
     def listdir(self, path):
-        children = self.tree[path].children
-        return [c.data for c in children]
+        return self.tree[path].get_children_data()
 
     def isenterable(self, path):
-        children = self.tree[path].children
-        return True if children else False
+        info = self.tree[path].info
+        # nodes without info are implicit parent directories
+        return info.isdir() if info is not None else True
 
     def abspath(self, path):
         return self.tree[path].get_path()
 
+    def count_items(self, path, stop_at=-1):
+        return self.tree[path].count
+
+    def getsize(self, path):
+        return self.tree[path].size
+
+    def footprint(self):
+        if self.archive is None:
+            return 0
+        return Archive.footprint(self) + \
+            len(self.archive.filelist) * ZIPINFO_BYTES + \
+            len(self.offsets or ()) * LOOKUP_BYTES
+
+    def close(self):
+        self.offsets = None
+        Archive.close(self)
+
+    @profiling.timed('lookup.member')
+    def getmember(self, info):
+        if info.member is None:
+            # names in a ColumnTree are joined from their components and
+            # lost slashes and './' of the member names, offsets are as read
+            if self.offsets is None:
+                self.offsets = dict(
+                    (m.header_offset, m) for m in self.archive.infolist()
+                )
+            info.member = self.offsets[info.offset]
+        return info.member
+
+    def openmember(self, path, accept=None):
+        member = self.getmember(self.tree[path].info)
+        if member.is_dir():
+            return None
+        # seeking back in a compressed member decompresses it again
+        return member_file(
+            self.archive.open(member), member.file_size,
+            member.compress_type == zipfile.ZIP_STORED, accept
+        )
+
+    @staticmethod
+    def mode(zinfo):
+        return (zinfo.external_attr >> 16) & 0o7777
+
+    @staticmethod
+    def mtime(zinfo):
+        return time.mktime(zinfo.date_time + (0, 0, -1))
+
     @staticmethod
     def isarchive(path):
         return zipfile.is_zipfile(path)
 
     @staticmethod
-    def open(path):
-        return zipfile.ZipFile(file=path)
+    def sniff(header, path):
+        # local file header, or end of central directory of an empty zip
+        return header.startswith((b'PK\x03\x04', b'PK\x05\x06'))
+
+    @staticmethod
+    def open(path, fileobj=None):
+        return zipfile.ZipFile(file=fileobj or path)
+
+    @staticmethod
+    def iterentries(path):
+        with Zip.open(path) as archive:
+            for m in archive.infolist():
+                yield Zip.entry(m)
 
     @staticmethod
-    def extract(container, archive, target_path, checked=None):
+    @profiling.timed('extract', size=lambda args, result:
+                     profiling.filesize(args[1].filename))
+    def extract(container, archive, target_path, checked=None,
+                workers=None):
         if checked:
             members = []
-            for node in checked:
-                # without root data
-                arr = container.tree[node.get_path()].get_data_array()[1:]
-                if arr[0] == '..':
+            for path, arcname in checked.walk():
+                info = container.tree[path].info
+                if info is None:
                     continue
-                members += [archive.getinfo(os.sep.join(arr))]
+                members += [container.getmember(info)]
         else:
             members = None
-        archive.extractall(path=target_path, members=members)
 
+        workers = workers or Archive.workers
+        if workers > 1 and ondisk(archive.fp):
+            if members is None:
+                members = archive.infolist()
+            parallel.extract(
+                parallel.ZipSource(archive.filename),
+                [
+                    (m.filename, m.is_dir(), Zip.mode(m), Zip.mtime(m), m)
+                    for m in members
+                ],
+                target_path, workers
+            )
+        else:
+            archive.extractall(path=target_path, members=members)
+
+    @staticmethod
+    @profiling.timed('create', size=lambda args, result:
+                     profiling.filesize(args[1]))
+    def create(container, archive_path, checked, workers=None):
+        try:
+            with zipfile.ZipFile(archive_path, 'w',
+                                 zipfile.ZIP_DEFLATED) as z:
+                for path, arcname in checked.walk():
+                    z.write(path, arcname=arcname)
+        except (IOError, OSError, zipfile.BadZipfile):
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
+            return False
+        return True
+
+
+@register
+class LibArchive(Container, Archive):
+    """Formats only the system libarchive reads, 7z, rar, cpio, ar and cab
+    and tar or cpio compressed with zstd, lz4 or lzip. Tried after Tar and
+    Zip, so tar and zip archives are still read by tarfile and zipfile.
+    """
+
+    # libarchive is only used for reading, create makes no such archives
+    extensions = ()
+
+    # magic numbers of archive formats and of compressed streams, which
+    # may hold an archive or just a compressed file
+    formats = (
+        b'7z\xbc\xaf\x27\x1c', b'Rar!\x1a\x07', b'!<arch>\n', b'MSCF',
+        b'070701', b'070702', b'070707', b'\xc7\x71', b'\x71\xc7',
+    )
+    filters = (
+        b'\x28\xb5\x2f\xfd', b'\xfd7zXZ\x00', b'\x1f\x8b', b'\x04\x22\x4d\x18',
+        b'LZIP', b'BZh',
+    )
+
+    @profiling.timed('open', size=lambda args, result:
+                 profiling.filesize(args[0].path))
+    def __init__(self, path, background=False, fileobj=None, parent=None):
+        # libarchive lists all members in one pass over the archive
+        self.path = os.path.abspath(path)
+        self.parent = parent
+        self.stream = fileobj
+        self.archive = LibArchive.open(self.path, fileobj)
+
+        index = Archive.cache.load(self.path) \
+            if Archive.cache and parent is None else None
+        if index is None:
+            entries = list(self.archive.entries())
+            if Archive.cache and parent is None:
+                Archive.cache.store(self.path, {'members': entries})
+        else:
+            entries = index['members']
+        self.load_tree(entries)
+
+    @profiling.timed('listdir')
+    def listdir(self, path):
+        return self.tree[path].get_children_data()
+
+    def isenterable(self, path):
+        info = self.tree[path].info
+        # nodes without info are implicit parent directories
+        return info.isdir() if info is not None else True
+
+    def abspath(self, path):
+        return self.tree[path].get_path()
+
+    def count_items(self, path, stop_at=-1):
+        return self.tree[path].count
+
+    def getsize(self, path):
+        return self.tree[path].size
+
+    def openmember(self, path, accept=None):
+        info = self.tree[path].info
+        if info is None or info.type not in tarfile.REGULAR_TYPES:
+            return None
+        stream = self.archive.open(info.name)
+        if stream is None:
+            return None
+        # members are only read from the start of the archive on
+        return member_file(stream, info.size, False, accept)
+
+    @staticmethod
+    def isarchive(path):
+        return libarchive.available and libarchive.isarchive(path)
+
+    @staticmethod
+    def sniff(header, path):
+        if not libarchive.available:
+            return False
+        if header.startswith(LibArchive.formats):
+            return True
+        # only libarchive can tell what is in the compressed stream
+        if header.startswith(LibArchive.filters):
+            if isinstance(path, str):
+                return libarchive.isarchive(path)
+            return libarchive.isarchive(None, path)
+        return False
+
+    @staticmethod
+    def open(path, fileobj=None):
+        return libarchive.Archive(path, fileobj)
+
+    @staticmethod
+    def iterentries(path):
+        archive = LibArchive.open(path)
+        try:
+            for e in archive.entries():
+                yield e
+        finally:
+            archive.close()
+
+    @staticmethod
+    @profiling.timed('extract', size=lambda args, result:
+                     profiling.filesize(args[1].path))
+    def extract(container, archive, target_path, checked=None,
+                workers=None):
+        # libarchive writes the members to disk in a single pass
+        names = None
+        if checked:
+            names = set()
+            for path, arcname in checked.walk():
+                info = container.tree[path].info
+                if info is not None:
+                    names.add(info.name)
+        archive.extract(target_path, names)
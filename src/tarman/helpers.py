@@ -1,25 +1,85 @@
+from tarman.cache import ListingCache
+from tarman.constants import SNIFF_CACHE_SIZE
+from tarman.constants import SNIFF_SIZE
 
 import tarman.containers
 
 import codecs
-import inspect
-import sys
+import collections
+import io
+import logging
 import os
+import stat
 
 
-def get_archive_class(path):
-    classes = inspect.getmembers(
-        sys.modules[tarman.containers.__name__], inspect.isclass
-    )
+# path -> ((st_ino, st_mtime_ns), archive class or None), the most
+# recently used last
+sniffed = collections.OrderedDict()
 
-    for c in classes:
-        if c[0] == 'Archive':
-            continue
-        methods = inspect.getmembers(c[1], inspect.isfunction)
-        for m in methods:
-            if m[0] == 'isarchive':
-                if m[1](path):
-                    return c[1]
+
+def get_archive_class(path, fileobj=None):
+    """Return the Archive class of the file at `path` or None.
+
+    Every class of tarman.containers.ARCHIVES looks at the same first
+    SNIFF_SIZE bytes of the file, read once. Answers are kept per path
+    until the inode or the mtime of the file change. With `fileobj`, a
+    member of another archive at `path`, that is read instead and the
+    answer is not kept.
+    """
+    if fileobj is not None:
+        header = fileobj.read(SNIFF_SIZE)
+        fileobj.seek(0)
+        aclass = sniff(header, fileobj)
+        fileobj.seek(0)
+        return aclass
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    key = (st.st_ino, st.st_mtime_ns)
+    cached = sniffed.get(path)
+    if cached is not None and cached[0] == key:
+        sniffed.move_to_end(path)
+        return cached[1]
+
+    try:
+        with io.open(path, 'rb') as f:
+            header = f.read(SNIFF_SIZE)
+    except (IOError, OSError):
+        return None
+
+    aclass = sniff(header, path)
+    sniffed[path] = (key, aclass)
+    while len(sniffed) > SNIFF_CACHE_SIZE:
+        sniffed.popitem(last=False)
+    return aclass
+
+
+def sniff(header, path):
+    for cls in tarman.containers.ARCHIVES:
+        if cls.sniff(header, path):
+            return cls
+    return None
+
+
+def maybe_archive(header):
+    """Whether a file that starts with the bytes `header` may be an archive,
+    told without reading more of it.
+    """
+    # bzip2 compressed tar archives only tell from their first block
+    return header.startswith(b'BZh') or \
+        sniff(header, io.BytesIO(header)) is not None
+
+
+def get_archive_class_by_name(path):
+    name = path.lower()
+    for cls in tarman.containers.ARCHIVES:
+        if name.endswith(cls.extensions):
+            return cls
     return None
 
 
@@ -28,6 +88,46 @@ def container(path):
     return aclass(path) if aclass else None
 
 
+def configure(home_dir):
+    """Set the listing cache and the number of workers of the archives
+    from the environment.
+    """
+    # archive listings are only cached when TARMAN_CACHE is set to 1 or
+    # TARMAN_CACHE_DIR to the directory to cache them in
+    cache_dir = os.environ.get('TARMAN_CACHE_DIR', '')
+    if not cache_dir and os.environ.get('TARMAN_CACHE', '0') not in ('', '0'):
+        cache_dir = os.path.join(os.environ.get(
+            'XDG_CACHE_HOME', os.path.join(home_dir, '.cache')
+        ), 'tarman')
+    if cache_dir:
+        tarman.containers.Archive.cache = ListingCache(cache_dir)
+    logging.info("Listing cache: '{0}'".format(cache_dir))
+
+    default = os.cpu_count() or 1
+    try:
+        workers = int(os.environ.get('TARMAN_WORKERS', default))
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        logging.warning("TARMAN_WORKERS is not a positive number, using "
+                        "{0} workers".format(default))
+        workers = default
+    tarman.containers.Archive.workers = workers
+    logging.info("Extract workers: {0}".format(
+        tarman.containers.Archive.workers
+    ))
+
+
+def format_size(size):
+    for unit in ['', 'K', 'M', 'G', 'T']:
+        if size < 1024:
+            break
+        size /= 1024.0
+    if unit:
+        return "{0:.1f}{1}".format(size, unit)
+    return "{0}".format(size)
+
+
 def makepath(path):
     try:
         os.makedirs(path)
@@ -0,0 +1,23 @@
+"""Modules imported on first use.
+
+tarman is started often and most runs never open an archive, so format
+backends and the overlay windows are only imported once something of them
+is used.
+"""
+import importlib.util
+import sys
+
+
+def module(name):
+    """Return module `name`, which is only executed once one of its
+    attributes is accessed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    result = importlib.util.module_from_spec(spec)
+    sys.modules[name] = result
+    loader.exec_module(result)
+    return result
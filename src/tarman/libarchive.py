@@ -0,0 +1,350 @@
+"""The system libarchive through ctypes.
+
+libarchive reads many formats tarfile and zipfile do not, 7z, rar, cpio,
+ar and cab among them, compressed with zstd, xz, lz4 and others. It can
+only read an archive from its start to its end, so every listing,
+extraction or member read is one pass over the archive with a read handle
+of its own. Headers are parsed in C and member data is skipped in C, which
+makes listing fast even for large archives.
+
+Extraction goes through libarchive's write-disk side, which restores
+permissions, modification times and links. Archives are read from a file
+or from a seekable file object, like a member of another archive.
+
+Without libarchive on the system `available` is false and nothing else
+here works.
+"""
+import ctypes
+import ctypes.util
+import io
+import os
+import stat
+import tarfile
+import weakref
+
+
+ARCHIVE_EOF = 1
+ARCHIVE_OK = 0
+ARCHIVE_WARN = -20
+ARCHIVE_FATAL = -30
+
+EXTRACT_PERM = 0x0002
+EXTRACT_TIME = 0x0004
+EXTRACT_SECURE_SYMLINKS = 0x0100
+EXTRACT_SECURE_NODOTDOT = 0x0200
+EXTRACT_FLAGS = EXTRACT_PERM | EXTRACT_TIME | EXTRACT_SECURE_SYMLINKS | \
+    EXTRACT_SECURE_NODOTDOT
+
+BLOCK_SIZE = 1024 * 1024
+
+READ_CALLBACK = ctypes.CFUNCTYPE(
+    ctypes.c_ssize_t, ctypes.c_void_p, ctypes.c_void_p,
+    ctypes.POINTER(ctypes.c_void_p)
+)
+SEEK_CALLBACK = ctypes.CFUNCTYPE(
+    ctypes.c_int64, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int64,
+    ctypes.c_int
+)
+
+# name, result type, argument types
+FUNCTIONS = (
+    ('archive_error_string', ctypes.c_char_p, (ctypes.c_void_p, )),
+    ('archive_read_new', ctypes.c_void_p, ()),
+    ('archive_read_support_filter_all', ctypes.c_int, (ctypes.c_void_p, )),
+    ('archive_read_support_format_all', ctypes.c_int, (ctypes.c_void_p, )),
+    ('archive_read_open_filename', ctypes.c_int,
+     (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t)),
+    ('archive_read_set_read_callback', ctypes.c_int,
+     (ctypes.c_void_p, READ_CALLBACK)),
+    ('archive_read_set_seek_callback', ctypes.c_int,
+     (ctypes.c_void_p, SEEK_CALLBACK)),
+    ('archive_read_set_callback_data', ctypes.c_int,
+     (ctypes.c_void_p, ctypes.c_void_p)),
+    ('archive_read_open1', ctypes.c_int, (ctypes.c_void_p, )),
+    ('archive_read_next_header', ctypes.c_int,
+     (ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p))),
+    ('archive_read_header_position', ctypes.c_int64, (ctypes.c_void_p, )),
+    ('archive_read_data', ctypes.c_ssize_t,
+     (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t)),
+    ('archive_read_extract2', ctypes.c_int,
+     (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p)),
+    ('archive_read_free', ctypes.c_int, (ctypes.c_void_p, )),
+    ('archive_write_disk_new', ctypes.c_void_p, ()),
+    ('archive_write_disk_set_options', ctypes.c_int,
+     (ctypes.c_void_p, ctypes.c_int)),
+    ('archive_write_disk_set_standard_lookup', ctypes.c_int,
+     (ctypes.c_void_p, )),
+    ('archive_write_free', ctypes.c_int, (ctypes.c_void_p, )),
+    ('archive_entry_pathname', ctypes.c_char_p, (ctypes.c_void_p, )),
+    ('archive_entry_pathname_utf8', ctypes.c_char_p, (ctypes.c_void_p, )),
+    ('archive_entry_hardlink', ctypes.c_char_p, (ctypes.c_void_p, )),
+    ('archive_entry_copy_pathname', None,
+     (ctypes.c_void_p, ctypes.c_char_p)),
+    ('archive_entry_copy_hardlink', None,
+     (ctypes.c_void_p, ctypes.c_char_p)),
+    ('archive_entry_filetype', ctypes.c_uint, (ctypes.c_void_p, )),
+    ('archive_entry_perm', ctypes.c_uint, (ctypes.c_void_p, )),
+    ('archive_entry_size', ctypes.c_int64, (ctypes.c_void_p, )),
+    ('archive_entry_mtime', ctypes.c_int64, (ctypes.c_void_p, )),
+)
+
+# tarfile type codes of the file types of entries
+TYPES = {
+    stat.S_IFREG: tarfile.REGTYPE,
+    stat.S_IFDIR: tarfile.DIRTYPE,
+    stat.S_IFLNK: tarfile.SYMTYPE,
+    stat.S_IFCHR: tarfile.CHRTYPE,
+    stat.S_IFBLK: tarfile.BLKTYPE,
+    stat.S_IFIFO: tarfile.FIFOTYPE,
+}
+
+
+def load():
+    for name in (ctypes.util.find_library('archive'), 'libarchive.so.13'):
+        if not name:
+            continue
+        try:
+            library = ctypes.CDLL(name)
+            for function, restype, argtypes in FUNCTIONS:
+                f = getattr(library, function)
+                f.restype = restype
+                f.argtypes = argtypes
+        except (OSError, AttributeError):
+            continue
+        return library
+    return None
+
+
+lib = load()
+available = lib is not None
+
+
+class ArchiveError(IOError):
+    pass
+
+
+def decode(name):
+    return name.decode('utf-8', 'surrogateescape')
+
+
+def normalize(name):
+    """Member name like tarfile has it, without a leading './' or '/' and
+    without a trailing '/'.
+    """
+    name = name.strip('/')
+    while name.startswith('./'):
+        name = name[2:]
+    return '' if name == '.' else name
+
+
+class Reader():
+    """One pass over an archive, a file at `path` or the seekable file
+    object `fileobj`. Iterating yields the entry pointer of every member,
+    valid until the next one is read.
+    """
+
+    def __init__(self, path, fileobj=None):
+        self.fileobj = fileobj
+        self.handle = lib.archive_read_new()
+        lib.archive_read_support_filter_all(self.handle)
+        lib.archive_read_support_format_all(self.handle)
+        if fileobj is None:
+            status = lib.archive_read_open_filename(
+                self.handle, os.fsencode(path), BLOCK_SIZE
+            )
+        else:
+            fileobj.seek(0)
+            self.buffer = ctypes.create_string_buffer(BLOCK_SIZE)
+            # kept as attributes, libarchive holds no reference to them
+            self.read_callback = READ_CALLBACK(self.read)
+            self.seek_callback = SEEK_CALLBACK(self.seek)
+            lib.archive_read_set_read_callback(
+                self.handle, self.read_callback
+            )
+            lib.archive_read_set_seek_callback(
+                self.handle, self.seek_callback
+            )
+            # sets up the data set open1 reads from, even if it is NULL
+            lib.archive_read_set_callback_data(self.handle, None)
+            status = lib.archive_read_open1(self.handle)
+        if status != ARCHIVE_OK:
+            error = self.error()
+            self.close()
+            raise error
+
+    def read(self, handle, data, buffer):
+        try:
+            n = self.fileobj.readinto(self.buffer)
+        except Exception:
+            return ARCHIVE_FATAL
+        buffer[0] = ctypes.addressof(self.buffer)
+        return n
+
+    def seek(self, handle, data, offset, whence):
+        try:
+            return self.fileobj.seek(offset, whence)
+        except Exception:
+            return ARCHIVE_FATAL
+
+    def error(self):
+        message = lib.archive_error_string(self.handle)
+        return ArchiveError(
+            decode(message) if message else "libarchive failed"
+        )
+
+    def check(self, status):
+        if status < ARCHIVE_WARN:
+            raise self.error()
+        return status
+
+    def __iter__(self):
+        entry = ctypes.c_void_p()
+        while True:
+            if self.handle is None:
+                raise ArchiveError("the archive was closed")
+            status = lib.archive_read_next_header(
+                self.handle, ctypes.byref(entry)
+            )
+            if status == ARCHIVE_EOF:
+                return
+            self.check(status)
+            yield entry
+
+    def name(self, entry):
+        name = lib.archive_entry_pathname_utf8(entry) or \
+            lib.archive_entry_pathname(entry) or b''
+        return normalize(decode(name))
+
+    def entry(self, entry):
+        """The (name, type, size, mode, mtime, offset) tuple of `entry`."""
+        filetype = lib.archive_entry_filetype(entry)
+        if lib.archive_entry_hardlink(entry):
+            type = tarfile.LNKTYPE
+        else:
+            type = TYPES.get(filetype, tarfile.REGTYPE)
+        return (
+            self.name(entry), type, lib.archive_entry_size(entry),
+            lib.archive_entry_perm(entry), lib.archive_entry_mtime(entry),
+            lib.archive_read_header_position(self.handle)
+        )
+
+    def readinto(self, buffer):
+        if self.handle is None:
+            raise ArchiveError("the archive was closed")
+        n = lib.archive_read_data(
+            self.handle, (ctypes.c_char * len(buffer)).from_buffer(buffer),
+            len(buffer)
+        )
+        return self.check(n)
+
+    def close(self):
+        if self.handle is not None:
+            lib.archive_read_free(self.handle)
+            self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemberReader(io.RawIOBase):
+    """Data of the current member of a Reader, which is closed with it."""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.reader.readinto(memoryview(buffer).cast('B'))
+
+    def close(self):
+        self.reader.close()
+        io.RawIOBase.close(self)
+
+
+class Archive():
+    """An archive libarchive reads, a file at `path` or the seekable file
+    object `fileobj`. Closing it frees the readers of listings and members
+    that are still open.
+    """
+
+    def __init__(self, path, fileobj=None):
+        self.path = path
+        self.fileobj = fileobj
+        self.readers = weakref.WeakSet()
+
+    def reader(self):
+        reader = Reader(self.path, self.fileobj)
+        self.readers.add(reader)
+        return reader
+
+    def entries(self):
+        """Yield the (name, type, size, mode, mtime, offset) tuples of the
+        members.
+        """
+        with self.reader() as reader:
+            for entry in reader:
+                e = reader.entry(entry)
+                if e[0]:  # not the archive root, like '.' of cpio
+                    yield e
+
+    def open(self, name):
+        """File object of the data of member `name`, None if there is no
+        such member.
+        """
+        reader = self.reader()
+        for entry in reader:
+            if reader.name(entry) == name:
+                return io.BufferedReader(MemberReader(reader), BLOCK_SIZE)
+        reader.close()
+        return None
+
+    def extract(self, target_path, names=None):
+        """Extract the members `names`, all of them if None, below
+        `target_path`.
+        """
+        target_path = os.path.abspath(target_path)
+        disk = lib.archive_write_disk_new()
+        try:
+            lib.archive_write_disk_set_options(disk, EXTRACT_FLAGS)
+            lib.archive_write_disk_set_standard_lookup(disk)
+            with self.reader() as reader:
+                for entry in reader:
+                    name = reader.name(entry)
+                    if not name or names is not None and name not in names:
+                        continue
+                    lib.archive_entry_copy_pathname(
+                        entry, os.fsencode(os.path.join(target_path, name))
+                    )
+                    hardlink = lib.archive_entry_hardlink(entry)
+                    if hardlink:
+                        lib.archive_entry_copy_hardlink(
+                            entry, os.fsencode(os.path.join(
+                                target_path, normalize(decode(hardlink))
+                            ))
+                        )
+                    reader.check(
+                        lib.archive_read_extract2(reader.handle, entry, disk)
+                    )
+        finally:
+            lib.archive_write_free(disk)
+
+    def close(self):
+        for reader in list(self.readers):
+            reader.close()
+        self.readers.clear()
+
+
+def isarchive(path, fileobj=None):
+    """Whether libarchive can read the first member of the archive."""
+    try:
+        with Reader(path, fileobj) as reader:
+            for entry in reader:
+                return True
+    except ArchiveError:
+        pass
+    return False
@@ -2,6 +2,7 @@
 from tarman.exceptions import NotImplemented
 
 import curses
+import curses.textpad
 import os
 import threading
 import time
@@ -53,7 +54,7 @@ class TextWin(OverlayWin):
         self.main.mainscr.refresh()
         self.main.stdscr.touchwin()
         self.main.stdscr.refresh()
-        self.main.refresh_scr()
+        self.main.refresh_scr(full=True)
 
     def close(self):
         self.showing = False
@@ -100,7 +101,7 @@ class QuestionWin(OverlayWin):
         self.main.mainscr.refresh()
         self.main.stdscr.touchwin()
         self.main.stdscr.refresh()
-        self.main.refresh_scr()
+        self.main.refresh_scr(full=True)
 
         return self.exitstatus
 
@@ -147,7 +148,7 @@ class WorkWin(OverlayWin):
             handle.main.mainscr.refresh()
             handle.main.stdscr.touchwin()
             handle.main.stdscr.refresh()
-            handle.main.refresh_scr()
+            handle.main.refresh_scr(full=True)
 
         t = threading.Thread(target=run, args=(self, w))
         t.setDaemon(True)
@@ -212,7 +213,7 @@ class PathWin(OverlayWin):
         self.main.mainscr.refresh()
         self.main.stdscr.touchwin()
         self.main.stdscr.refresh()
-        self.main.refresh_scr()
+        self.main.refresh_scr(full=True)
 
         s = s.replace('\n', '').strip()
 
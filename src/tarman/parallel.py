@@ -0,0 +1,223 @@
+"""Extraction and compression on a thread pool.
+
+Members of zip files and of uncompressed tar files can be read at known
+offsets, so several files can be decompressed and written at the same time.
+Every worker thread reads through its own file handle, directories are
+created before the workers start and permissions and modification times are
+set in a final pass, once nothing writes into the directories any more.
+
+GzipWriter compresses fixed size blocks of its input on all workers and
+writes every block as a gzip member of its own, which concatenated still
+form one valid gzip file.
+
+zlib and file I/O release the GIL, which makes threads sufficient.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from tarman.constants import COMPRESS_BLOCK
+
+import collections
+import io
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+
+
+CHUNK = 1024 * 1024
+
+
+class Source():
+    """Per-thread file handles on one archive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.handles = []
+        self.lock = threading.Lock()
+
+    def handle(self):
+        handle = getattr(self.local, 'handle', None)
+        if handle is None:
+            handle = self.open()
+            self.local.handle = handle
+            with self.lock:
+                self.handles.append(handle)
+        return handle
+
+    def open(self):
+        raise NotImplementedError()
+
+    def copy(self, key, out):
+        raise NotImplementedError()
+
+    def close(self):
+        for handle in self.handles:
+            handle.close()
+        self.handles = []
+
+
+class TarSource(Source):
+    """Uncompressed tar file, keys are TarInfo objects."""
+
+    def open(self):
+        return io.open(self.path, 'rb')
+
+    def copy(self, key, out):
+        f = self.handle()
+        f.seek(key.offset_data)
+        remaining = key.size
+        while remaining > 0:
+            data = f.read(min(CHUNK, remaining))
+            if not data:
+                raise IOError("unexpected end of data in '{0}'".format(
+                    self.path
+                ))
+            out.write(data)
+            remaining -= len(data)
+
+
+class ZipSource(Source):
+    """Zip file, keys are ZipInfo objects."""
+
+    def open(self):
+        return zipfile.ZipFile(self.path)
+
+    def copy(self, key, out):
+        with self.handle().open(key) as src:
+            shutil.copyfileobj(src, out, CHUNK)
+
+
+def destination(target_path, name):
+    """Path of member `name` below `target_path`, None if there is none.
+    Like zipfile does, a drive and empty, '.' and '..' components are left
+    out of the name, links already extracted may still lead outside.
+    """
+    parts = os.path.splitdrive(name.replace('/', os.sep))[1].split(os.sep)
+    name = os.sep.join(
+        p for p in parts if p not in ('', os.curdir, os.pardir)
+    )
+    if not name:
+        return None
+    path = os.path.realpath(os.path.join(target_path, name))
+    if path != target_path and \
+            not path.startswith(target_path.rstrip(os.sep) + os.sep):
+        return None
+    return path
+
+
+def extract(source, members, target_path, workers,
+            special=(), extract_special=None):
+    """Extract `members`, a list of (name, isdir, mode, mtime, key) tuples,
+    from `source` on `workers` threads. `special` members (links, devices)
+    are passed to `extract_special` one by one after the regular files.
+    Mode None or 0 leaves the permissions alone.
+    """
+    target_path = os.path.realpath(target_path)
+    # a name can be in an archive more than once, like in an appended tar,
+    # the last member wins as it does when they are extracted one by one
+    last = collections.OrderedDict()
+    for name, isdir, mode, mtime, key in members:
+        path = destination(target_path, name)
+        if path is not None:
+            last.pop(path, None)
+            last[path] = (isdir, mode, mtime, key)
+    dirs = []
+    files = []
+    for path, (isdir, mode, mtime, key) in last.items():
+        if isdir:
+            dirs.append((path, mode, mtime))
+        else:
+            files.append((path, mode, mtime, key))
+
+    parents = set(path for path, mode, mtime in dirs)
+    parents.update(os.path.dirname(f[0]) for f in files)
+    for path in sorted(parents):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def write(item):
+        path, mode, mtime, key = item
+        with io.open(path, 'wb') as out:
+            source.copy(key, out)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(write, files):
+                pass
+    finally:
+        source.close()
+
+    for member in special:
+        extract_special(member)
+
+    for path, mode, mtime, key in files:
+        set_attrs(path, mode, mtime)
+    # children first, a parent without search permission locks them out
+    for path, mode, mtime in sorted(dirs, reverse=True):
+        set_attrs(path, mode, mtime)
+
+
+def set_attrs(path, mode, mtime):
+    if mode:
+        os.chmod(path, mode)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def compress_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class GzipWriter():
+    """Write-only file object producing a multi-member gzip file."""
+
+    def __init__(self, path, workers, level=6, block=COMPRESS_BLOCK):
+        self.fileobj = io.open(path, 'wb')
+        self.workers = workers
+        self.level = level
+        self.block = block
+        self.buffer = []
+        self.buffered = 0
+        self.position = 0
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = collections.deque()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        size = len(data)
+        self.buffer.append(data)
+        self.buffered += size
+        self.position += size
+        if self.buffered >= self.block:
+            data = b''.join(self.buffer)
+            while len(data) >= self.block:
+                self.submit(data[:self.block])
+                data = data[self.block:]
+            self.buffer = [data]
+            self.buffered = len(data)
+        return size
+
+    def submit(self, data):
+        self.pending.append(self.pool.submit(compress_block, data, self.level))
+        # keep the amount of queued blocks, and so memory, bounded
+        while len(self.pending) > self.workers * 2:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.fileobj.closed:
+            return
+        try:
+            if self.buffered or not self.position:
+                self.submit(b''.join(self.buffer))
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().result())
+        finally:
+            self.pool.shutdown()
+            self.fileobj.close()
@@ -0,0 +1,106 @@
+"""Timers on the hot paths of tarman.
+
+Profiling is switched on with the --profile option or the TARMAN_PROFILE
+environment variable, before the modules that use timed are imported.
+Otherwise timed returns the functions it decorates unchanged, so the
+timers cost nothing when they are off.
+"""
+from tarman import lazy
+
+import collections
+import functools
+import io
+import logging
+import os
+import time
+
+cProfile = lazy.module('cProfile')
+pstats = lazy.module('pstats')
+
+
+# TARMAN_PROFILE=1 times the hot paths, TARMAN_PROFILE=cprofile also runs
+# cProfile until report
+enabled = bool(os.environ.get('TARMAN_PROFILE'))
+cprofile = os.environ.get('TARMAN_PROFILE') == 'cprofile'
+# name -> [calls, seconds, bytes]
+stats = collections.defaultdict(lambda: [0, 0.0, 0])
+profiler = None
+
+
+def enable(with_cprofile=False):
+    global enabled, cprofile
+    enabled = True
+    cprofile = cprofile or with_cprofile
+
+
+def timed(name, size=None):
+    """Decorator that adds the calls of the function and the time spent in
+    them to stats[name], and the bytes `size(args, result)` returns.
+    """
+    def decorate(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            entry = stats[name]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+            if size is not None:
+                entry[2] += size(args, result) or 0
+            return result
+        return wrapper
+    return decorate
+
+
+def filesize(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def start():
+    global profiler
+    if cprofile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+
+def summary():
+    lines = ["{0:<16} {1:>10} {2:>12} {3:>12} {4:>14}".format(
+        "timer", "calls", "total ms", "mean us", "bytes"
+    )]
+    for name, (calls, seconds, size) in sorted(
+            stats.items(), key=lambda item: -item[1][1]):
+        lines.append("{0:<16} {1:>10} {2:>12.1f} {3:>12.1f} {4:>14}".format(
+            name, calls, seconds * 1e3, seconds * 1e6 / calls, size
+        ))
+    return "\n".join(lines)
+
+
+def report(out=None):
+    """Log the summary of the timers and the cProfile statistics, or write
+    them to the file `out`.
+    """
+    global profiler
+    if not enabled:
+        return
+
+    def write(text):
+        if out is None:
+            logging.info(text)
+        else:
+            out.write(text + "\n")
+
+    write("Profile:\n{0}".format(summary()))
+    if profiler is not None:
+        profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(
+            'cumulative'
+        ).print_stats(40)
+        write("cProfile:\n{0}".format(stream.getvalue()))
+        profiler = None
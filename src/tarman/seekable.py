@@ -0,0 +1,377 @@
+"""Seekable readers for compressed tarballs.
+
+tarfile reads .tar.gz and .tar.xz through file objects that can only seek
+by decompressing everything from the start of the stream. The readers here
+keep decompressor checkpoints instead, so tarfile can be opened on top of
+them in uncompressed mode and jump to any member by decompressing only the
+data between the nearest checkpoint and the member.
+"""
+from tarman import lazy
+from tarman.constants import CHECKPOINT_SPAN
+
+import bisect
+import io
+import struct
+import zlib
+
+# Python may be built without it, gzip files are still read then
+lzma = lazy.module('lzma')
+
+
+CHUNK = 64 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+
+def open(path, span=CHECKPOINT_SPAN, fileobj=None):
+    """Return a checkpointing reader for a gzip or xz file, or None when the
+    file is neither or its layout does not allow random access. The file is
+    read through the seekable `fileobj` instead of opening `path` when it
+    is given.
+    """
+    if fileobj is None:
+        with io.open(path, 'rb') as f:
+            magic = f.read(len(XZ_MAGIC))
+    else:
+        magic = fileobj.read(len(XZ_MAGIC))
+        fileobj.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return GzipReader(path, span, fileobj)
+    if magic == XZ_MAGIC:
+        try:
+            return XzReader(path, fileobj)
+        except (ValueError, ImportError):
+            return None
+    return None
+
+
+class Reader():
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        result = []
+        while size != 0:
+            if self.bufpos >= len(self.buffer):
+                if not self.fill():
+                    break
+            end = len(self.buffer) if size < 0 else self.bufpos + size
+            data = self.buffer[self.bufpos:end]
+            self.bufpos += len(data)
+            self.position += len(data)
+            if size > 0:
+                size -= len(data)
+            result.append(data)
+        return b''.join(result)
+
+    def skip(self, size):
+        while size > 0:
+            if self.bufpos >= len(self.buffer):
+                if not self.fill():
+                    break
+            n = min(size, len(self.buffer) - self.bufpos)
+            self.bufpos += n
+            self.position += n
+            size -= n
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            self.skip(float('inf'))
+            offset += self.position
+        if offset < self.position or offset - self.position > self.span:
+            self.restore(offset)
+        self.skip(offset - self.position)
+        return self.position
+
+    def close(self):
+        self.fileobj.close()
+
+    @property
+    def closed(self):
+        return self.fileobj.closed
+
+    def export_checkpoints(self):
+        return []
+
+    def import_checkpoints(self, checkpoints):
+        pass
+
+
+class GzipReader(Reader):
+    """Reads (multi-member) gzip files.
+
+    Every gzip member start is a checkpoint that can be restored from its
+    (uncompressed, compressed) offsets alone; those are exported so they can
+    be stored next to the listing. In between, a copy of the decompressor is
+    kept every `span` bytes of output. zlib state can not be serialized, so
+    those checkpoints only live as long as the reader.
+    """
+
+    def __init__(self, path, span=CHECKPOINT_SPAN, fileobj=None):
+        self.name = path
+        self.span = span
+        self.fileobj = io.open(path, 'rb') if fileobj is None else fileobj
+        # sorted by uncompressed offset: (uoffset, coffset, decompressobj)
+        # where decompressobj None marks the start of a gzip member
+        self.checkpoints = [(0, 0, None)]
+        self.offsets = [0]
+        self.indexed = 0
+        self.reset(0, 0, None)
+
+    def restore(self, offset):
+        i = bisect.bisect_right(self.offsets, offset) - 1
+        uoffset, coffset, decompressor = self.checkpoints[i]
+        if uoffset <= self.position <= offset:
+            return  # reading on is cheaper than going back
+        self.reset(uoffset, coffset, decompressor)
+
+    def reset(self, uoffset, coffset, decompressor):
+        self.fileobj.seek(coffset)
+        self.pending = b''
+        self.decompressor = zlib.decompressobj(31) \
+            if decompressor is None else decompressor.copy()
+        self.buffer = b''
+        self.bufpos = 0
+        self.position = uoffset
+        self.eof = False
+
+    def add_checkpoint(self, uoffset, coffset, decompressor):
+        i = bisect.bisect_left(self.offsets, uoffset)
+        if i < len(self.offsets) and self.offsets[i] == uoffset:
+            if decompressor is None:
+                # member starts are cheaper to restore than snapshots
+                self.checkpoints[i] = (uoffset, coffset, None)
+            return
+        self.checkpoints.insert(i, (uoffset, coffset, decompressor))
+        self.offsets.insert(i, uoffset)
+
+    def fill(self):
+        if self.eof:
+            return False
+        self.buffer = b''
+        self.bufpos = 0
+        end = self.position
+
+        if self.decompressor is None:
+            # previous member ended, look for another one
+            while len(self.pending) < len(GZIP_MAGIC):
+                data = self.fileobj.read(CHUNK)
+                if not data:
+                    break
+                self.pending += data
+            if not self.pending.startswith(GZIP_MAGIC):
+                self.eof = True  # trailing garbage or padding
+                return False
+            coffset = self.fileobj.tell() - len(self.pending)
+            self.add_checkpoint(end, coffset, None)
+            self.decompressor = zlib.decompressobj(31)
+        elif end >= self.indexed and end - self.offsets[
+                bisect.bisect_right(self.offsets, end) - 1] >= self.span:
+            coffset = self.fileobj.tell() - len(self.pending)
+            self.add_checkpoint(end, coffset, self.decompressor.copy())
+
+        if not self.pending:
+            self.pending = self.fileobj.read(CHUNK)
+            if not self.pending:
+                # like gzip, a member must not end early
+                raise EOFError(
+                    "Compressed file ended before the end-of-stream marker "
+                    "was reached"
+                )
+
+        self.buffer = self.decompressor.decompress(self.pending, CHUNK * 4)
+        if self.decompressor.eof:
+            self.pending = self.decompressor.unused_data
+            self.decompressor = None
+        else:
+            self.pending = self.decompressor.unconsumed_tail
+        self.indexed = max(self.indexed, end + len(self.buffer))
+        return True
+
+    def export_checkpoints(self):
+        return [(u, c) for u, c, d in self.checkpoints if d is None]
+
+    def import_checkpoints(self, checkpoints):
+        for uoffset, coffset in checkpoints:
+            self.add_checkpoint(uoffset, coffset, None)
+
+
+class XzReader(Reader):
+    """Reads xz files made of several blocks or streams.
+
+    Block boundaries come from the index at the end of each stream, which is
+    read when the reader is created, so every block can be decoded on its own
+    with a raw decoder set up from the block header. Raises ValueError for
+    files with a single block or filters that can not be set up that way.
+    """
+
+    def __init__(self, path, fileobj=None):
+        self.name = path
+        self.span = 0
+        self.fileobj = io.open(path, 'rb') if fileobj is None else fileobj
+        try:
+            # (uoffset, coffset, uncompressed size)
+            self.blocks = self.read_index()
+            if len(self.blocks) < 2:
+                raise ValueError("single block xz file")
+            self.offsets = [b[0] for b in self.blocks]
+            self.open_block(0)
+        except (ValueError, IndexError, struct.error, lzma.LZMAError):
+            if fileobj is None:
+                self.fileobj.close()
+            else:
+                fileobj.seek(0)
+            raise ValueError("xz file has no usable block index")
+
+    def read_index(self):
+        f = self.fileobj
+        f.seek(0, 2)
+        end = f.tell()
+        streams = []
+        while end > 0:
+            f.seek(end - 4)
+            if f.read(4) == b'\0\0\0\0':
+                end -= 4  # stream padding
+                continue
+            f.seek(end - 12)
+            footer = f.read(12)
+            if footer[10:] != b'YZ':
+                raise ValueError("not an xz stream footer")
+            index_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+            index_start = end - 12 - index_size
+            f.seek(index_start)
+            index = f.read(index_size)
+            if index[0:1] != b'\0':
+                raise ValueError("not an xz index")
+            count, p = varint(index, 1)
+            records = []
+            for i in range(count):
+                unpadded, p = varint(index, p)
+                usize, p = varint(index, p)
+                records.append((unpadded, usize))
+            start = index_start - sum((r[0] + 3) & ~3 for r in records) - 12
+            f.seek(start)
+            if f.read(6) != XZ_MAGIC:
+                raise ValueError("not an xz stream header")
+            streams.append((start + 12, records))
+            end = start
+
+        blocks = []
+        uoffset = 0
+        for coffset, records in reversed(streams):
+            for unpadded, usize in records:
+                blocks.append((uoffset, coffset, usize))
+                uoffset += usize
+                coffset += (unpadded + 3) & ~3
+        self.size = uoffset
+        return blocks
+
+    def block_filters(self, coffset):
+        self.fileobj.seek(coffset)
+        header = self.fileobj.read(1)
+        header += self.fileobj.read((header[0] + 1) * 4 - 1)
+        flags = header[1]
+        p = 2
+        if flags & 0x40:
+            _, p = varint(header, p)
+        if flags & 0x80:
+            _, p = varint(header, p)
+        filters = []
+        for i in range((flags & 3) + 1):
+            filter_id, p = varint(header, p)
+            props_size, p = varint(header, p)
+            props = header[p:p + props_size]
+            p += props_size
+            filters.append(xz_filter(filter_id, props))
+        return len(header), filters
+
+    def restore(self, offset):
+        i = max(bisect.bisect_right(self.offsets, offset) - 1, 0)
+        if i == self.block and self.blockstart <= self.position <= offset:
+            return
+        self.open_block(i)
+
+    def open_block(self, i):
+        self.block = i
+        uoffset, coffset, usize = self.blocks[i]
+        header_size, filters = self.block_filters(coffset)
+        self.fileobj.seek(coffset + header_size)
+        self.decompressor = lzma.LZMADecompressor(
+            lzma.FORMAT_RAW, filters=filters
+        )
+        self.blockstart = uoffset
+        self.remaining = usize
+        self.buffer = b''
+        self.bufpos = 0
+        self.position = uoffset
+
+    def fill(self):
+        while self.remaining == 0:
+            if self.block + 1 >= len(self.blocks):
+                return False
+            self.open_block(self.block + 1)
+        if self.decompressor.eof:
+            raise lzma.LZMAError("xz block is shorter than its index says")
+        if self.decompressor.needs_input:
+            data = self.fileobj.read(CHUNK)
+            if not data:
+                raise lzma.LZMAError("xz block is truncated")
+        else:
+            data = b''
+        self.buffer = self.decompressor.decompress(
+            data, min(self.remaining, CHUNK * 4)
+        )
+        self.bufpos = 0
+        self.remaining -= len(self.buffer)
+        return True
+
+
+def varint(data, p):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[p]
+        p += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, p
+        shift += 7
+
+
+# names in lzma, which is only imported once an xz file is read
+BCJ_FILTERS = {
+    0x04: 'FILTER_X86',
+    0x05: 'FILTER_POWERPC',
+    0x06: 'FILTER_IA64',
+    0x07: 'FILTER_ARM',
+    0x08: 'FILTER_ARMTHUMB',
+    0x09: 'FILTER_SPARC',
+}
+
+
+def xz_filter(filter_id, props):
+    if filter_id == 0x21:
+        bits = props[0] & 0x3F
+        if bits > 40:
+            raise ValueError("invalid LZMA2 dictionary size")
+        dict_size = 0xFFFFFFFF if bits == 40 \
+            else (2 | (bits & 1)) << (bits // 2 + 11)
+        return {'id': lzma.FILTER_LZMA2, 'dict_size': dict_size}
+    if filter_id == 0x03:
+        return {'id': lzma.FILTER_DELTA, 'dist': props[0] + 1}
+    if filter_id in BCJ_FILTERS:
+        result = {'id': getattr(lzma, BCJ_FILTERS[filter_id])}
+        if len(props) == 4:
+            result['start_offset'] = struct.unpack('<I', props)[0]
+        return result
+    raise ValueError("unsupported xz filter {0:#x}".format(filter_id))
@@ -0,0 +1,116 @@
+from tarman import batch
+
+import os
+import shutil
+import tarman.tests.test_containers
+import tempfile
+import unittest2 as unittest
+
+
+def extract_or_die(path, target, threads):
+    if path.endswith('die.tar'):
+        os._exit(1)
+    return extract_one(path, target, threads)
+
+
+extract_one = batch.extract_one
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.testdatadir = os.path.join(self.testdirectory, 'testdata')
+        self.tmpdir = tempfile.mkdtemp()
+        self.target = os.path.join(self.tmpdir, 'out')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.testdatadir, name)
+
+    def test_expand(self):
+        self.assertEqual(
+            batch.expand([
+                self.path('*.tar'), self.path('testdata.tar.gz'),
+                self.path('corrupted.tar')
+            ]),
+            [
+                self.path('corrupted.tar'), self.path('tešt.tar'),
+                self.path('testdata.tar.gz')
+            ]
+        )
+
+    def test_targets(self):
+        copy = os.path.join(self.tmpdir, 'testdata.tar.gz')
+        shutil.copy(self.path('testdata.tar.gz'), copy)
+        self.assertEqual(
+            batch.targets(
+                [self.path('testdata.tar.gz'), copy, self.testfilepath],
+                self.target
+            ),
+            [
+                os.path.join(self.target, 'testdata'),
+                os.path.join(self.target, 'testdata-1'),
+                os.path.join(
+                    self.target, os.path.basename(self.testfilepath) + '.d'
+                ),
+            ]
+        )
+
+    def test_extract(self):
+        # a gzip stream that ends early and a file that is no archive
+        truncated = os.path.join(self.tmpdir, 'truncated.tar.gz')
+        with open(self.path('testdata.tar.gz'), 'rb') as f:
+            data = f.read()
+        with open(truncated, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        fake = os.path.join(self.tmpdir, 'fake.tar')
+        with open(fake, 'w') as f:
+            f.write('no archive')
+
+        paths = [
+            self.path('testdata.tar.gz'), truncated, fake,
+            self.path('tešt.tar'), self.path('corrupted.tar'),
+        ]
+        finished = []
+        report = batch.extract(
+            paths, self.target, processes=2, io=4, done=finished.append
+        )
+
+        self.assertEqual(len(finished), 5)
+        self.assertEqual(
+            [e['archive'] for e in report['archives']], paths
+        )
+        self.assertEqual(report['extracted'], 3)
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual((report['processes'], report['threads']), (2, 2))
+        errors = [e['error'] for e in report['archives']]
+        self.assertIsNone(errors[0])
+        self.assertIsNotNone(errors[1])
+        self.assertIn('not an archive', errors[2])
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.target, 'testdata', 'a', 'aa', 'aaa')
+        ))
+        self.assertTrue(os.path.isdir(os.path.join(self.target, 'tešt')))
+
+    def test_worker_dies(self):
+        die = os.path.join(self.tmpdir, 'die.tar')
+        shutil.copy(self.path('tešt.tar'), die)
+        paths = [self.path('testdata.tar.gz'), die, self.path('tešt.tar')]
+        try:
+            # workers are forked and see the replaced function too
+            batch.extract_one = extract_or_die
+            report = batch.extract(paths, self.target, processes=2)
+        finally:
+            batch.extract_one = extract_one
+        self.assertEqual(
+            [e['archive'] for e in report['archives']], paths
+        )
+        errors = [e['error'] for e in report['archives']]
+        self.assertIsNone(errors[0])
+        self.assertIn('BrokenProcessPool', errors[1])
+        self.assertIsNone(errors[2])
+        self.assertEqual(report['extracted'], 2)
@@ -0,0 +1,133 @@
+from tarman.cache import ListingCache
+from tarman.cache import OpenArchives
+from tarman.containers import Archive
+from tarman.containers import Tar
+from tarman.tree import SelectionTree
+
+import os
+import shutil
+import tarman.tests.test_containers
+import tempfile
+import unittest2 as unittest
+
+
+class TestListingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = ListingCache(os.path.join(self.tmpdir, 'cache'))
+        self.testarchivepath = os.path.join(self.tmpdir, 'testdata.tar.gz')
+        shutil.copy(
+            os.path.join(self.testdirectory, 'testdata', 'testdata.tar.gz'),
+            self.testarchivepath
+        )
+
+    def tearDown(self):
+        Archive.cache = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.load(self.testarchivepath))
+
+    def test_store_load(self):
+        index = {'members': [('a', b'5', 0, 0o755, 0, 0)]}
+        self.assertTrue(self.cache.store(self.testarchivepath, index))
+        self.assertEqual(self.cache.load(self.testarchivepath), index)
+
+    def test_invalidated_by_change(self):
+        self.cache.store(self.testarchivepath, {'members': []})
+        with open(self.testarchivepath, 'ab') as f:
+            f.write(b'\0')
+        self.assertIsNone(self.cache.load(self.testarchivepath))
+
+    def test_evict(self):
+        self.cache.size = 0
+        self.cache.store(self.testarchivepath, {'members': []})
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+    def test_tar_from_cache(self):
+        Archive.cache = self.cache
+        Tar(self.testarchivepath)
+        self.assertIsNotNone(self.cache.load(self.testarchivepath))
+
+        tar = Tar(self.testarchivepath)
+        path = os.path.join(self.testarchivepath, 'a', 'aa', 'aaa')
+        info = tar.tree[path].info
+        self.assertIsNone(info.member)
+        self.assertTrue(tar.isenterable(os.path.dirname(path)))
+        self.assertEqual(tar.getmember(info).name, 'a/aa/aaa')
+
+
+class TestOpenArchives(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = []
+        for name in ('a.tar.gz', 'b.tar.gz'):
+            path = os.path.join(self.tmpdir, name)
+            shutil.copy(
+                os.path.join(self.testdirectory, 'testdata',
+                             'testdata.tar.gz'),
+                path
+            )
+            self.paths.append(path)
+        Archive.cache = ListingCache(os.path.join(self.tmpdir, 'cache'))
+
+    def tearDown(self):
+        Archive.cache = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_evict(self):
+        a, b = [Tar(path) for path in self.paths]
+        archives = OpenArchives(a.footprint())
+        archives.add(a)
+        archives.add(b)
+        self.assertEqual(archives.evict(keep=a), [b])
+        self.assertIn(a, archives)
+        self.assertNotIn(b, archives)
+        self.assertIsNone(b.archive)
+        self.assertEqual(archives.footprint(), a.footprint())
+
+    def test_least_recently_used(self):
+        a, b = [Tar(path) for path in self.paths]
+        archives = OpenArchives(a.footprint())
+        archives.add(a)
+        archives.add(b)
+        archives.add(a)
+        self.assertEqual(archives.evict(), [b])
+        self.assertEqual(list(archives), [a])
+
+    def test_reopen(self):
+        tar = Tar(self.paths[0])
+        checked = SelectionTree(tar.path, tar)
+        checked.add(os.path.join(tar.path, 'a', 'aa'))
+        tar.close()
+
+        tar = Tar(tar.path)  # from the listing cache
+        checked.rebind(tar)
+        self.assertIs(checked.container, tar)
+        self.assertEqual(
+            [arcname for path, arcname in checked.walk()],
+            ['a', 'a/aa', 'a/aa/aaa']
+        )
+
+    def test_evict_nested(self):
+        outer = Tar(self.paths[0])
+        inner = Tar(
+            os.path.join(outer.path, 'inner.tar.gz'),
+            fileobj=open(self.paths[1], 'rb'), parent=outer
+        )
+        other = Tar(self.paths[1])
+        archives = OpenArchives(0)
+        for archive in (outer, inner, other):
+            archives.add(archive)
+        # the archive inner is read from stays open
+        self.assertEqual(archives.evict(keep=inner), [other])
+        self.assertEqual(list(archives), [outer, inner])
+        # and closes what is inside of it
+        self.assertEqual(archives.evict(), [outer, inner])
+        self.assertIsNone(inner.stream)
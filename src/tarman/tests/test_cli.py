@@ -0,0 +1,150 @@
+from tarman import cli
+from tarman.containers import Archive
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tarman.tests.test_containers
+import tempfile
+import unittest2 as unittest
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.testarchivepath = os.path.join(
+            self.testdirectory, 'testdata', 'testdata.tar.gz'
+        )
+        self.tmpdir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['TARMAN_CACHE_DIR'] = ''
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        Archive.cache = None
+        Archive.workers = 1
+        shutil.rmtree(self.tmpdir)
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            status = cli.main(list(argv), out=out)
+        return status, out.getvalue(), err.getvalue()
+
+    def test_ls(self):
+        status, out, err = self.run_cli('ls', self.testarchivepath)
+        self.assertEqual(status, 0)
+        names = out.splitlines()
+        self.assertIn('a/aa/aaa', names)
+        self.assertIn('b/ba/baa/baab', names)
+
+    def test_ls_json(self):
+        status, out, err = self.run_cli(
+            'ls', '--json', self.testarchivepath
+        )
+        self.assertEqual(status, 0)
+        members = dict(
+            (m['name'], m) for m in map(json.loads, out.splitlines())
+        )
+        self.assertEqual(members['a']['type'], 'directory')
+        self.assertEqual(members['a/aa/aaa']['type'], 'file')
+        self.assertEqual(members['a/aa/aaa']['size'], 4)
+
+    def test_ls_not_archive(self):
+        status, out, err = self.run_cli('ls', self.testfilepath)
+        self.assertEqual(status, 1)
+        self.assertIn('not an archive', err)
+
+    def test_usage(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(cli.main(['x']), 2)
+
+    def test_bad_workers(self):
+        for value in ('', 'many', '0'):
+            os.environ['TARMAN_WORKERS'] = value
+            with self.assertLogs(level='WARNING') as logs:
+                status, out, err = self.run_cli('ls', self.testarchivepath)
+            self.assertEqual(status, 0)
+            self.assertIn('a/aa/aaa', out.splitlines())
+            self.assertIn('TARMAN_WORKERS', logs.output[0])
+            self.assertEqual(Archive.workers, os.cpu_count() or 1)
+
+    def test_extract_members(self):
+        status, out, err = self.run_cli(
+            'x', '-v', '-C', self.tmpdir, self.testarchivepath, 'a/a?', 'c'
+        )
+        self.assertEqual(status, 0)
+        self.assertEqual(
+            out.splitlines(),
+            ['a', 'a/aa', 'a/aa/aaa', 'a/ab', 'a/ac', 'c']
+        )
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.tmpdir, 'a', 'aa', 'aaa'))
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'b')))
+
+    def test_extract_overlapping_members(self):
+        # 'a/aa/*' only matches entries in 'a', which is selected already
+        for members in (['a', 'a/aa/*'], ['a/aa/*', 'a']):
+            target = tempfile.mkdtemp(dir=self.tmpdir)
+            status, out, err = self.run_cli(
+                'x', '-C', target, self.testarchivepath, *members
+            )
+            self.assertEqual(status, 0)
+            self.assertEqual(err, '')
+            self.assertTrue(
+                os.path.isfile(os.path.join(target, 'a', 'aa', 'aaa'))
+            )
+            self.assertTrue(os.path.isfile(os.path.join(target, 'a', 'ac')))
+
+    def test_extract_missing_member(self):
+        status, out, err = self.run_cli(
+            'x', '-C', self.tmpdir, self.testarchivepath, 'nope'
+        )
+        self.assertEqual(status, 1)
+        self.assertIn("'nope' not found", err)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_create(self):
+        source = os.path.join(self.tmpdir, 'source')
+        self.run_cli('x', '-C', source, self.testarchivepath)
+        for name in ('new.tar.gz', 'new.zip'):
+            path = os.path.join(self.tmpdir, name)
+            status, out, err = self.run_cli(
+                'c', '-C', source, path, 'a', 'c'
+            )
+            self.assertEqual(status, 0)
+            status, out, err = self.run_cli('ls', path)
+            self.assertIn('a/aa/aaa', out.splitlines())
+            self.assertNotIn('b', out.splitlines())
+
+    def test_create_errors(self):
+        status, out, err = self.run_cli(
+            'c', os.path.join(self.tmpdir, 'new.rar'), self.testfilepath
+        )
+        self.assertEqual(status, 2)
+        status, out, err = self.run_cli(
+            'c', os.path.join(self.tmpdir, 'new.tar'), 'missing'
+        )
+        self.assertEqual(status, 1)
+
+    def test_batch(self):
+        status, out, err = self.run_cli(
+            'batch', '-C', self.tmpdir, self.testarchivepath
+        )
+        self.assertEqual(status, 0)
+        self.assertTrue(out.startswith('ok '))
+        self.assertIn('1 extracted, 0 failed', out)
+        self.assertTrue(os.path.isdir(os.path.join(self.tmpdir, 'testdata')))
+
+        status, out, err = self.run_cli(
+            'batch', '--json', '-C', self.tmpdir, self.testfilepath
+        )
+        self.assertEqual(status, 1)
+        self.assertEqual(json.loads(out)['failed'], 1)
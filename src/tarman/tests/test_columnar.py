@@ -0,0 +1,75 @@
+# -*- coding: UTF-8 -*-
+
+from tarman.columnar import ColumnTree
+from tarman.containers import Container
+from tarman.exceptions import OutOfRange
+
+import tarfile
+import unittest2 as unittest
+
+
+class TestColumnTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = ColumnTree('/x.tar', Container())
+        self.tree.add_entries([
+            ('a/', tarfile.DIRTYPE, 0, 0o755, 1, 0),
+            ('a/b', tarfile.REGTYPE, 3, 0o644, 2, 512),
+            ('c/d/e', tarfile.REGTYPE, 4, 0o600, 3, 1024, 2),
+            ('a//f', tarfile.REGTYPE, 5, 0o644, 4, 2048),
+        ])
+        self.tree.update_totals()
+
+    def test_listdir(self):
+        self.assertEqual(self.tree.listdir('/x.tar'), ['a', 'c'])
+        self.assertEqual(self.tree.listdir('/x.tar/a'), ['b', 'f'])
+        self.assertEqual(self.tree.listdir('/x.tar/c/d'), ['e'])
+
+    def test_contains(self):
+        self.assertIn('/x.tar/c/d', self.tree)
+        self.assertNotIn('/x.tar/c/x', self.tree)
+        self.assertRaises(OutOfRange, self.tree.__contains__, '/y.tar/a')
+
+    def test_info(self):
+        self.assertIsNone(self.tree['/x.tar/c'].info)
+        info = self.tree['/x.tar/c/d/e'].info
+        self.assertEqual(info.name, 'c/d/e')
+        self.assertEqual(info.type, tarfile.REGTYPE)
+        self.assertEqual((info.size, info.csize), (4, 2))
+        self.assertEqual((info.mode, info.offset), (0o600, 1024))
+        self.assertTrue(self.tree['/x.tar/a'].info.isdir())
+
+    def test_old_regular_file(self):
+        # AREGTYPE is b'\0', which must not read as an implicit directory
+        self.tree.add_entries([('g', tarfile.AREGTYPE, 6, 0o644, 5, 4096)])
+        self.tree.update_totals()
+        node = self.tree['/x.tar/g']
+        self.assertIn(node.info.type, tarfile.REGULAR_TYPES)
+        self.assertFalse(node.info.isdir())
+        self.assertEqual(node.info.offset, 4096)
+        self.assertEqual(node.count, 1)
+        self.assertEqual(self.tree.root.count, 4)
+        self.assertIn('/x.tar/g', [n.get_path() for n in self.tree])
+
+    def test_totals(self):
+        self.assertEqual(self.tree.root.count, 3)
+        self.assertEqual(self.tree.root.size, 12)
+        self.assertEqual(self.tree['/x.tar/a'].csize, 8)
+
+    def test_node(self):
+        node = self.tree['/x.tar/c/d/e']
+        self.assertEqual(node.data, 'e')
+        self.assertEqual(node.get_path(), '/x.tar/c/d/e')
+        self.assertEqual(node.parent, self.tree['/x.tar/c/d'])
+        self.assertEqual(
+            [n.get_path() for n in self.tree],
+            ['/x.tar/a/b', '/x.tar/a/f', '/x.tar/c/d/e']
+        )
+
+    def test_add_and_delete(self):
+        node = self.tree.add('/x.tar/c/g/h')
+        self.assertEqual(node.get_path(), '/x.tar/c/g/h')
+        self.assertEqual(self.tree.listdir('/x.tar/c'), ['d', 'g'])
+        del self.tree['/x.tar/c/d']
+        self.assertNotIn('/x.tar/c/d/e', self.tree)
+        self.assertEqual(self.tree.listdir('/x.tar/c'), ['g'])
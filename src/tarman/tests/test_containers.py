@@ -1,12 +1,30 @@
 # -*- coding: UTF-8 -*-
 
+from tarman import libarchive
+from tarman import parallel
+from tarman import seekable
+from tarman.constants import SPOOL_SIZE
 from tarman.containers import Container
 from tarman.containers import FileSystem
+from tarman.containers import LibArchive
+from tarman.containers import Scan
+from tarman.containers import Tar
+from tarman.containers import Zip
+from tarman.tree import SelectionTree
 
+import gzip
+import io
 import os
+import shutil
+import tarfile
+import tarman.containers
+import tarman.helpers
 import tarman.tests.test_containers
 import tarman.tests.test_tree
+import tempfile
+import threading
 import unittest2 as unittest
+import zipfile
 
 
 class TestFileSystem(unittest.TestCase):
@@ -30,6 +48,21 @@ class TestFileSystem(unittest.TestCase):
     def test_isenterable(self):
         self.assertTrue(self.fs.isenterable(self.testdirectory))
 
+    def test_listdir_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, 'd'))
+            self.assertEqual(self.fs.listdir(tmpdir), ['d'])
+            self.assertIn(tmpdir, self.fs.dircache)
+            self.assertTrue(self.fs.isenterable(os.path.join(tmpdir, 'd')))
+
+            open(os.path.join(tmpdir, 'f'), 'w').close()
+            os.utime(tmpdir, (0, 0))  # any other mtime invalidates
+            self.assertEqual(sorted(self.fs.listdir(tmpdir)), ['d', 'f'])
+            self.assertFalse(self.fs.isenterable(os.path.join(tmpdir, 'f')))
+        finally:
+            shutil.rmtree(tmpdir)
+
     def test_abspath(self):
         self.assertEqual(self.fs.abspath('.'), self.testcwd)
 
@@ -70,9 +103,638 @@ class TestFileSystem(unittest.TestCase):
     def test_count_items(self):
         self.assertEqual(
             self.fs.count_items(self.testdatadir),
-            17
+            19
         )
         self.assertEqual(
             self.fs.count_items(self.testdatadir, stop_at=9),
             9
         )
+
+
+class TestTar(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.testarchivepath = os.path.join(
+            self.testdirectory, 'testdata', 'testdata.tar.gz'
+        )
+        self.tar = Tar(self.testarchivepath)
+
+    def test_container(self):
+        self.assertTrue(isinstance(self.tar, Container))
+
+    def test_listdir(self):
+        self.assertEqual(
+            sorted(self.tar.listdir(self.testarchivepath)),
+            ['a', 'b', 'c']
+        )
+        self.assertEqual(
+            sorted(self.tar.listdir(
+                os.path.join(self.testarchivepath, 'b', 'ba', 'baa')
+            )),
+            ['baaa', 'baab']
+        )
+
+    def test_isenterable(self):
+        self.assertTrue(self.tar.isenterable(
+            os.path.join(self.testarchivepath, 'a', 'ab')
+        ))
+        self.assertFalse(self.tar.isenterable(
+            os.path.join(self.testarchivepath, 'a', 'ac')
+        ))
+
+    def test_member_info(self):
+        info = self.tar.tree[
+            os.path.join(self.testarchivepath, 'b', 'ba', 'baa', 'baab')
+        ].info
+        self.assertFalse(info.isdir())
+        self.assertEqual(info.size, 4)
+        self.assertEqual(info.mode, 0o644)
+        self.assertEqual(info.member.name, 'b/ba/baa/baab')
+
+    def test_count_items(self):
+        self.assertEqual(self.tar.count_items(self.testarchivepath), 5)
+        self.assertEqual(
+            self.tar.count_items(os.path.join(self.testarchivepath, 'a')), 2
+        )
+        self.assertEqual(
+            self.tar.count_items(os.path.join(self.testarchivepath, 'c')), 1
+        )
+
+    def test_getsize(self):
+        self.assertEqual(self.tar.getsize(self.testarchivepath), 17)
+        self.assertEqual(
+            self.tar.getsize(os.path.join(self.testarchivepath, 'b')), 9
+        )
+        self.assertEqual(
+            self.tar.getsize(os.path.join(self.testarchivepath, 'a', 'ab')),
+            0
+        )
+
+    def test_footprint(self):
+        self.assertGreater(self.tar.footprint(), 0)
+        self.tar.close()
+        self.assertIsNone(self.tar.tree)
+        self.assertEqual(self.tar.footprint(), 0)
+
+    def test_extract_checked(self):
+        checked = SelectionTree(self.testarchivepath, self.tar)
+        checked.add(os.path.join(self.testarchivepath, 'b'), sub=True)
+        del checked[os.path.join(self.testarchivepath, 'b', 'ba', 'baa',
+                                 'baab')]
+        target = tempfile.mkdtemp()
+        try:
+            Tar.extract(self.tar, self.tar.archive, target, checked=checked)
+            self.assertTrue(os.path.isfile(
+                os.path.join(target, 'b', 'ba', 'baa', 'baaa', 'baaaa')
+            ))
+            self.assertFalse(os.path.exists(
+                os.path.join(target, 'b', 'ba', 'baa', 'baab')
+            ))
+            self.assertFalse(os.path.exists(os.path.join(target, 'c')))
+        finally:
+            shutil.rmtree(target)
+
+    def test_extract_parallel(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            archivepath = os.path.join(tmpdir, 'testdata.tar')
+            with Tar.open(self.testarchivepath) as src:
+                with tarfile.open(archivepath, 'w') as dst:
+                    for m in src.getmembers():
+                        dst.addfile(m, src.extractfile(m))
+                    link = tarfile.TarInfo('a/link')
+                    link.type = tarfile.SYMTYPE
+                    link.linkname = 'ac'
+                    dst.addfile(link)
+            tar = Tar(archivepath)
+            target = os.path.join(tmpdir, 'out')
+            Tar.extract(tar, tar.archive, target, workers=4)
+            path = os.path.join(target, 'b', 'ba', 'baa', 'baab')
+            with open(path) as f:
+                self.assertEqual(f.read(), 'baab')
+            self.assertEqual(
+                os.stat(path).st_mtime,
+                tar.tree[os.path.join(archivepath, 'b', 'ba', 'baa', 'baab')]
+                .info.mtime
+            )
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+            self.assertTrue(os.path.isdir(os.path.join(target, 'a', 'ab')))
+            self.assertEqual(os.readlink(os.path.join(target, 'a', 'link')),
+                             'ac')
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_extract_parallel_duplicate(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            # an appended tar, the second copy of 'f' replaces the first
+            archivepath = os.path.join(tmpdir, 'appended.tar')
+            for mode, data in (('w', b'first' * 100000), ('a', b'last')):
+                with tarfile.open(archivepath, mode) as dst:
+                    member = tarfile.TarInfo('f')
+                    member.size = len(data)
+                    dst.addfile(member, io.BytesIO(data))
+            tar = Tar(archivepath)
+            for workers in (1, 4):
+                target = os.path.join(tmpdir, 'out{0}'.format(workers))
+                Tar.extract(tar, tar.archive, target, workers=workers)
+                with open(os.path.join(target, 'f'), 'rb') as f:
+                    self.assertEqual(f.read(), b'last')
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestTarBackground(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.testarchivepath = os.path.join(
+            self.testdirectory, 'testdata', 'testdata.tar.gz'
+        )
+
+    def test_poll(self):
+        tar = Tar(self.testarchivepath, background=True)
+        self.assertIsNotNone(tar.scan)
+        self.assertIsNone(tar.getsize(self.testarchivepath))
+        added = 0
+        while tar.scan is not None:
+            added += tar.poll()
+        self.assertEqual(added, len(tar.archive.getmembers()))
+        self.assertIsNone(tar.error)
+        self.assertEqual(
+            sorted(tar.listdir(self.testarchivepath)), ['a', 'b', 'c']
+        )
+        self.assertEqual(tar.getsize(self.testarchivepath), 17)
+        tar.close()
+
+    def test_close(self):
+        tar = Tar(self.testarchivepath, background=True)
+        scan = tar.scan
+        reader = tar.reader
+        tar.close()
+        self.assertIsNone(tar.scan)
+        self.assertEqual(tar.poll(), 0)
+        scan.thread.join()
+        self.assertTrue(scan.done)
+        self.assertTrue(reader.closed)
+
+    def test_cancel_does_not_wait(self):
+        reading = threading.Event()
+        read = threading.Event()
+        released = []
+
+        def members():
+            yield 'a'
+            reading.set()
+            read.wait()  # a long member
+            yield 'b'
+        scan = Scan(members())
+        reading.wait()
+        scan.cancel(lambda: released.append(True))
+        self.assertEqual(released, [])
+        self.assertEqual(scan.take(), [])
+        read.set()
+        scan.thread.join()
+        self.assertEqual(released, [True])
+        self.assertEqual(scan.take(), [])
+        # a scan that is done releases at once
+        scan.cancel(lambda: released.append(True))
+        self.assertEqual(released, [True, True])
+
+
+class TestTarColumns(TestTar):
+    """The same tests on a listing stored in a ColumnTree."""
+
+    def setUp(self):
+        self.columnar_entries = tarman.containers.COLUMNAR_ENTRIES
+        tarman.containers.COLUMNAR_ENTRIES = 0
+        TestTar.setUp(self)
+
+    def tearDown(self):
+        tarman.containers.COLUMNAR_ENTRIES = self.columnar_entries
+
+    def test_member_info(self):
+        info = self.tar.tree[
+            os.path.join(self.testarchivepath, 'b', 'ba', 'baa', 'baab')
+        ].info
+        self.assertFalse(info.isdir())
+        self.assertEqual(info.size, 4)
+        self.assertEqual(info.mode, 0o644)
+        self.assertIsNone(info.member)
+        self.assertEqual(self.tar.getmember(info).name, 'b/ba/baa/baab')
+
+
+class TestCreate(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.testdatapath = os.path.join(
+            self.testdirectory, 'testdata', 'testdata'
+        )
+        self.fs = FileSystem()
+        self.checked = SelectionTree(self.testdatapath, self.fs)
+        self.checked.add(os.path.join(self.testdatapath, 'a'), sub=True)
+        self.checked.add(os.path.join(self.testdatapath, 'c'), sub=True)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_create_tar_gz(self):
+        archivepath = os.path.join(self.tmpdir, 'new.tar.gz')
+        self.assertTrue(Tar.create(self.fs, archivepath, self.checked,
+                                   workers=2))
+        with tarfile.open(archivepath) as tar:
+            self.assertEqual(
+                sorted(tar.getnames()),
+                ['a', 'a/aa', 'a/aa/aaa', 'a/ab', 'a/ab/.abb', 'a/ac', 'c']
+            )
+            self.assertEqual(tar.extractfile('c').read(), b'c')
+
+    def test_create_tar_gz_blocks(self):
+        archivepath = os.path.join(self.tmpdir, 'new.tar.gz')
+        with open(os.path.join(self.testdatapath, 'a', 'ac'), 'rb') as f:
+            data = f.read()
+        writer = parallel.GzipWriter(archivepath, 2, block=4)
+        for i in range(10):
+            writer.write(data)
+        writer.close()
+        with gzip.open(archivepath) as f:
+            self.assertEqual(f.read(), data * 10)
+        reader = seekable.open(archivepath)
+        reader.read()
+        self.assertTrue(len(reader.export_checkpoints()) > 1)
+        reader.close()
+
+    def test_create_zip(self):
+        archivepath = os.path.join(self.tmpdir, 'new.zip')
+        self.assertTrue(Zip.create(self.fs, archivepath, self.checked))
+        with zipfile.ZipFile(archivepath) as z:
+            self.assertIn('a/aa/aaa', z.namelist())
+            self.assertEqual(z.read('c'), b'c')
+
+    def test_create_unwritable(self):
+        for name in ('new.tar.gz', 'new.tar', 'new.tar.bz2'):
+            archivepath = os.path.join(self.tmpdir, 'missing', name)
+            self.assertFalse(Tar.create(self.fs, archivepath, self.checked))
+        self.assertFalse(Zip.create(
+            self.fs, os.path.join(self.tmpdir, 'missing', 'new.zip'),
+            self.checked
+        ))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_create_symlink_loop(self):
+        source = os.path.join(self.tmpdir, 'source')
+        os.makedirs(os.path.join(source, 'd'))
+        with open(os.path.join(source, 'd', 'f'), 'w') as f:
+            f.write('f')
+        os.symlink('..', os.path.join(source, 'd', 'up'))
+        checked = SelectionTree(self.tmpdir, self.fs)
+        checked.add(source)
+
+        archivepath = os.path.join(self.tmpdir, 'new.tar')
+        self.assertTrue(Tar.create(self.fs, archivepath, checked))
+        with tarfile.open(archivepath) as tar:
+            self.assertEqual(
+                sorted(tar.getnames()),
+                ['source', 'source/d', 'source/d/f', 'source/d/up']
+            )
+            self.assertTrue(tar.getmember('source/d/up').issym())
+            self.assertEqual(tar.getmember('source/d/up').linkname, '..')
+
+
+class TestZip(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.testarchivepath = os.path.join(self.tmpdir, 'testdata.zip')
+        with zipfile.ZipFile(self.testarchivepath, 'w') as z:
+            z.writestr('a/ab/', '')
+            z.writestr('a/aa/aaa', 'aaa\n')
+            z.writestr('a/ac', 'ac\n')
+            z.writestr('c', 'c')
+        self.zip = Zip(self.testarchivepath)
+
+    def tearDown(self):
+        self.zip.archive.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_listdir(self):
+        self.assertEqual(
+            sorted(self.zip.listdir(self.testarchivepath)), ['a', 'c']
+        )
+        self.assertEqual(
+            sorted(self.zip.listdir(
+                os.path.join(self.testarchivepath, 'a')
+            )),
+            ['aa', 'ab', 'ac']
+        )
+
+    def test_totals(self):
+        node = self.zip.tree[self.testarchivepath]
+        self.assertEqual(node.count, 3)
+        self.assertEqual(node.size, 8)
+        self.assertEqual(
+            node.csize,
+            sum(m.compress_size for m in self.zip.archive.infolist())
+        )
+
+    def test_extract_parallel(self):
+        target = os.path.join(self.tmpdir, 'out')
+        Zip.extract(self.zip, self.zip.archive, target, workers=4)
+        with open(os.path.join(target, 'a', 'aa', 'aaa')) as f:
+            self.assertEqual(f.read(), 'aaa\n')
+        self.assertTrue(os.path.isdir(os.path.join(target, 'a', 'ab')))
+
+    def test_extract_unsafe_names(self):
+        archivepath = os.path.join(self.tmpdir, 'unsafe.zip')
+        with zipfile.ZipFile(archivepath, 'w') as z:
+            z.writestr('../x', b'x')
+            z.writestr('/abs/y', b'y')
+            z.writestr('d/./../z', b'z')
+        archive = Zip(archivepath)
+        results = []
+        for workers in (1, 4):
+            target = os.path.join(self.tmpdir, 'out{0}'.format(workers))
+            Zip.extract(archive, archive.archive, target, workers=workers)
+            results.append(sorted(
+                os.path.relpath(os.path.join(path, name), target)
+                for path, dirs, files in os.walk(target) for name in files
+            ))
+        self.assertEqual(results[0], ['abs/y', 'd/z', 'x'])
+        self.assertEqual(results[1], results[0])
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'x')))
+
+    def test_isenterable(self):
+        self.assertTrue(self.zip.isenterable(
+            os.path.join(self.testarchivepath, 'a', 'aa')
+        ))
+        # explicit, empty directory entry
+        self.assertTrue(self.zip.isenterable(
+            os.path.join(self.testarchivepath, 'a', 'ab')
+        ))
+        self.assertFalse(self.zip.isenterable(
+            os.path.join(self.testarchivepath, 'c')
+        ))
+
+
+class TestZipColumns(TestZip):
+    """The same tests on a listing stored in a ColumnTree."""
+
+    def setUp(self):
+        self.columnar_entries = tarman.containers.COLUMNAR_ENTRIES
+        tarman.containers.COLUMNAR_ENTRIES = 0
+        TestZip.setUp(self)
+
+    def tearDown(self):
+        tarman.containers.COLUMNAR_ENTRIES = self.columnar_entries
+        TestZip.tearDown(self)
+
+    def test_getmember(self):
+        info = self.zip.tree[
+            os.path.join(self.testarchivepath, 'a', 'ab')
+        ].info
+        self.assertEqual(self.zip.getmember(info).filename, 'a/ab/')
+
+    def test_getmember_unusual_names(self):
+        archivepath = os.path.join(self.tmpdir, 'names.zip')
+        names = ['/abs', './dot/f', 'double//slash', 'd/']
+        with zipfile.ZipFile(archivepath, 'w') as z:
+            for name in names:
+                z.writestr(name, name.encode())
+        archive = Zip(archivepath)
+        for name, parts in zip(names, [
+                ['abs'], ['.', 'dot', 'f'], ['double', 'slash'], ['d']]):
+            info = archive.tree[os.path.join(archivepath, *parts)].info
+            self.assertEqual(archive.getmember(info).filename, name)
+
+
+class TestNested(unittest.TestCase):
+
+    def setUp(self):
+        self.testdirectory = os.path.dirname(
+            tarman.tests.test_containers.__file__
+        )
+        self.testarchivepath = os.path.join(
+            self.testdirectory, 'testdata', 'testdata.tar.gz'
+        )
+        self.tmpdir = tempfile.mkdtemp()
+        source = os.path.join(self.tmpdir, 'source')
+        with tarfile.open(self.testarchivepath) as archive:
+            archive.extractall(source)
+        with zipfile.ZipFile(os.path.join(source, 'inner.zip'), 'w',
+                             zipfile.ZIP_DEFLATED) as archive:
+            archive.write(os.path.join(source, 'a', 'aa', 'aaa'), 'a/aa/aaa')
+        shutil.copy(self.testarchivepath, os.path.join(source, 'inner.tgz'))
+        self.outer = {}
+        for name, mode in (('outer.tar', 'w'), ('outer.tar.bz2', 'w:bz2'),
+                           ('outer.zip', None)):
+            path = os.path.join(self.tmpdir, name)
+            if mode is None:
+                with zipfile.ZipFile(path, 'w') as archive:
+                    archive.write(
+                        os.path.join(source, 'inner.tgz'), 'inner.tgz'
+                    )
+            else:
+                with tarfile.open(path, mode) as archive:
+                    archive.add(source, 'outer')
+            self.outer[name] = path
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def nested(self, parent, path):
+        stream = parent.openmember(path)
+        aclass = tarman.helpers.get_archive_class(path, stream)
+        return aclass(path, fileobj=stream, parent=parent)
+
+    def test_tar_in_tar(self):
+        outer = Tar(self.outer['outer.tar'])
+        path = os.path.join(outer.path, 'outer', 'inner.tgz')
+        inner = self.nested(outer, path)
+        self.assertIsInstance(inner, Tar)
+        self.assertIs(inner.parent, outer)
+        self.assertEqual(sorted(inner.listdir(path)), ['a', 'b', 'c'])
+        # members of a plain tar are read from it in place
+        self.assertIsInstance(inner.stream, tarfile.ExFileObject)
+
+        target = os.path.join(self.tmpdir, 'target')
+        Tar.extract(inner, inner.archive, target, workers=4)
+        self.assertTrue(
+            os.path.isfile(os.path.join(target, 'a', 'aa', 'aaa'))
+        )
+        inner.close()
+        self.assertIsNone(inner.stream)
+        outer.close()
+
+    def test_zip_in_compressed_tar(self):
+        outer = Tar(self.outer['outer.tar.bz2'])
+        path = os.path.join(outer.path, 'outer', 'inner.zip')
+        inner = self.nested(outer, path)
+        self.assertIsInstance(inner, Zip)
+        # bzip2 can not seek back, the member is spooled
+        self.assertIsInstance(inner.stream, tempfile.SpooledTemporaryFile)
+        self.assertEqual(inner.listdir(path), ['a'])
+        inner.close()
+        outer.close()
+
+    def test_tar_in_zip(self):
+        outer = Zip(self.outer['outer.zip'])
+        path = os.path.join(outer.path, 'inner.tgz')
+        inner = self.nested(outer, path)
+        self.assertIsInstance(inner, Tar)
+        self.assertIn(
+            os.path.join(path, 'b', 'ba', 'baa', 'baab'), inner.tree
+        )
+        inner.close()
+        outer.close()
+
+    def test_not_archive(self):
+        outer = Tar(self.outer['outer.tar.bz2'])
+        path = os.path.join(outer.path, 'outer', 'a', 'aa', 'aaa')
+        self.assertIsNone(
+            outer.openmember(path, accept=tarman.helpers.maybe_archive)
+        )
+        outer.close()
+
+    def test_spool_size(self):
+        outer = Tar(self.outer['outer.tar.bz2'])
+        path = os.path.join(outer.path, 'outer', 'inner.tgz')
+        try:
+            tarman.containers.SPOOL_SIZE = 10
+            self.assertIsNone(outer.openmember(path))
+        finally:
+            tarman.containers.SPOOL_SIZE = SPOOL_SIZE
+        outer.close()
+
+
+@unittest.skipUnless(libarchive.available, "libarchive is not installed")
+class TestLibArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.testdatadir = os.path.join(
+            os.path.dirname(tarman.tests.test_containers.__file__),
+            'testdata'
+        )
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_archive_class(self):
+        for name in ('testdata.7z', 'testdata.tar.zst'):
+            self.assertIs(
+                tarman.helpers.get_archive_class(
+                    os.path.join(self.testdatadir, name)
+                ),
+                LibArchive
+            )
+        # tarfile still reads tar archives
+        self.assertIs(
+            tarman.helpers.get_archive_class(
+                os.path.join(self.testdatadir, 'testdata.tar.gz')
+            ),
+            Tar
+        )
+
+    def test_listdir(self):
+        for name in ('testdata.7z', 'testdata.tar.zst'):
+            archive = LibArchive(os.path.join(self.testdatadir, name))
+            self.assertEqual(
+                sorted(archive.listdir(archive.path)), ['a', 'b', 'c']
+            )
+            self.assertEqual(
+                sorted(archive.listdir(os.path.join(archive.path, 'a'))),
+                ['aa', 'ab', 'ac']
+            )
+            self.assertFalse(
+                archive.isenterable(os.path.join(archive.path, 'c'))
+            )
+            self.assertEqual(archive.getsize(archive.path), 17)
+
+    def test_extract_checked(self):
+        archive = LibArchive(os.path.join(self.testdatadir, 'testdata.7z'))
+        checked = SelectionTree(archive.path, archive)
+        checked.add(os.path.join(archive.path, 'a', 'aa'))
+        checked.add(os.path.join(archive.path, 'c'))
+        LibArchive.extract(archive, archive.archive, self.tmpdir, checked)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['a', 'c'])
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'a')), ['aa'])
+        with open(os.path.join(self.tmpdir, 'a', 'aa', 'aaa')) as f:
+            self.assertEqual(f.read(), 'aaa\n')
+
+    def test_extract_all(self):
+        archive = LibArchive.open(
+            os.path.join(self.testdatadir, 'testdata.tar.zst')
+        )
+        LibArchive.extract(None, archive, self.tmpdir)
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.tmpdir, 'b', 'ba', 'baa', 'baaa', 'baaaa')
+        ))
+
+    def test_nested(self):
+        outer = os.path.join(self.tmpdir, 'outer.tar')
+        with tarfile.open(outer, 'w') as archive:
+            archive.add(
+                os.path.join(self.testdatadir, 'testdata.7z'), 'inner.7z'
+            )
+        outer = Tar(outer)
+        path = os.path.join(outer.path, 'inner.7z')
+        stream = outer.openmember(path)
+        inner = LibArchive(path, fileobj=stream, parent=outer)
+        member = inner.openmember(os.path.join(path, 'a', 'aa', 'aaa'))
+        self.assertEqual(member.read(), b'aaa\n')
+        member.close()
+        inner.close()
+        outer.close()
+
+    def test_iterentries(self):
+        archives = []
+        open = LibArchive.open
+        try:
+            LibArchive.open = staticmethod(
+                lambda *args: archives.append(open(*args)) or archives[-1]
+            )
+            entries = LibArchive.iterentries(
+                os.path.join(self.testdatadir, 'testdata.7z')
+            )
+            self.assertTrue(next(entries)[0])
+            self.assertEqual(len(archives[0].readers), 1)
+            entries.close()
+            self.assertEqual(len(archives[0].readers), 0)
+        finally:
+            LibArchive.open = open
+
+    def test_close(self):
+        archive = LibArchive(os.path.join(self.testdatadir, 'testdata.7z'))
+        member = archive.archive.open('a/aa/aaa')
+        entries = archive.archive.entries()
+        next(entries)
+        readers = list(archive.archive.readers)
+        self.assertEqual(len(readers), 2)
+        archive.close()
+        # the handles are freed, reading on fails instead of crashing
+        self.assertEqual([r.handle for r in readers], [None, None])
+        self.assertRaises(IOError, member.read)
+        self.assertRaises(IOError, next, entries)
+
+    def test_not_archive(self):
+        # a compressed file that holds no archive
+        path = os.path.join(self.tmpdir, 'file.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(b'no archive')
+        self.assertIsNone(tarman.helpers.get_archive_class(path))
+
+    def test_unavailable(self):
+        path = os.path.join(self.testdatadir, 'testdata.7z')
+        with open(path, 'rb') as f:
+            header = f.read()
+        try:
+            libarchive.available = False
+            self.assertFalse(LibArchive.sniff(header, path))
+        finally:
+            libarchive.available = True
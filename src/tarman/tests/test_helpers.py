@@ -1,6 +1,18 @@
+from tarman.containers import Archive
+from tarman.containers import Tar
+from tarman.containers import Zip
+from tarman.helpers import format_size
+from tarman.helpers import get_archive_class
+from tarman.helpers import get_archive_class_by_name
+
 import os
+import shutil
+import tarfile
+import tarman.helpers
 import tarman.tests.test_containers
+import tempfile
 import unittest2 as unittest
+import zipfile
 
 
 class TestHelpers(unittest.TestCase):
@@ -45,3 +57,74 @@ class TestHelpers(unittest.TestCase):
         )
         self.assertIsInstance(text1, str)
         self.assertIsInstance(text2, str)
+
+    def test_configure_cache(self):
+        environ = dict(os.environ)
+        home = tempfile.mkdtemp()
+        try:
+            for name in ('TARMAN_CACHE', 'TARMAN_CACHE_DIR', 'XDG_CACHE_HOME'):
+                os.environ.pop(name, None)
+            tarman.helpers.configure(home)
+            self.assertIsNone(Archive.cache)  # off by default
+
+            os.environ['TARMAN_CACHE'] = '1'
+            tarman.helpers.configure(home)
+            self.assertEqual(
+                Archive.cache.directory, os.path.join(home, '.cache', 'tarman')
+            )
+
+            Archive.cache = None
+            del os.environ['TARMAN_CACHE']
+            os.environ['TARMAN_CACHE_DIR'] = os.path.join(home, 'listings')
+            tarman.helpers.configure(home)
+            self.assertEqual(
+                Archive.cache.directory, os.path.join(home, 'listings')
+            )
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+            Archive.cache = None
+            Archive.workers = 1
+            shutil.rmtree(home)
+
+    def test_get_archive_class_by_name(self):
+        self.assertIs(get_archive_class_by_name('/tmp/New.tar.gz'), Tar)
+        self.assertIs(get_archive_class_by_name('/tmp/new.tbz2'), Tar)
+        self.assertIs(get_archive_class_by_name('/tmp/new.zip'), Zip)
+        self.assertIsNone(get_archive_class_by_name('/tmp/new.txt'))
+
+    def test_get_archive_class(self):
+        self.assertIs(get_archive_class(self.testarchivepath), Tar)
+        self.assertIs(get_archive_class(
+            os.path.join(self.testdirectory, 'testdata', u'te\u0161t.tar')
+        ), Tar)
+        self.assertIsNone(get_archive_class(self.testfilepath))
+        self.assertIsNone(get_archive_class(self.testdirectory))
+        self.assertIsNone(get_archive_class('/nonexistent/file.tar'))
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for mode in ['w:xz', 'w:bz2']:
+                path = os.path.join(tmpdir, 'a.' + mode[2:])
+                with tarfile.open(path, mode) as tar:
+                    tar.add(self.testfilepath, arcname='f')
+                self.assertIs(get_archive_class(path), Tar)
+
+            path = os.path.join(tmpdir, 'a.zip')
+            with zipfile.ZipFile(path, 'w') as z:
+                z.writestr('f', 'f')
+            self.assertIs(get_archive_class(path), Zip)
+
+            # remembered until the file changes
+            self.assertIn(path, tarman.helpers.sniffed)
+            with open(path, 'w') as f:
+                f.write('not an archive')
+            os.utime(path, (0, 0))
+            self.assertIsNone(get_archive_class(path))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_format_size(self):
+        self.assertEqual(format_size(17), '17')
+        self.assertEqual(format_size(1536), '1.5K')
+        self.assertEqual(format_size(3 * 1024 ** 3), '3.0G')
@@ -0,0 +1,82 @@
+from tarman import profiling
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest2 as unittest
+
+
+SRC = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.enabled = profiling.enabled
+        profiling.stats.clear()
+
+    def tearDown(self):
+        profiling.enabled = self.enabled
+        profiling.stats.clear()
+
+    def test_disabled(self):
+        profiling.enabled = False
+
+        def f():
+            pass
+        self.assertIs(profiling.timed('f')(f), f)
+
+    def test_timed(self):
+        profiling.enabled = True
+
+        @profiling.timed('f', size=lambda args, result: len(result))
+        def f(data):
+            return data
+
+        self.assertEqual(f.__name__, 'f')
+        self.assertEqual(f(b'abc'), b'abc')
+        f(b'de')
+        calls, seconds, size = profiling.stats['f']
+        self.assertEqual(calls, 2)
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(size, 5)
+        self.assertIn('f', profiling.summary())
+
+    def test_report(self):
+        profiling.enabled = True
+        profiling.timed('f')(lambda: None)()
+        with self.assertLogs(level='INFO') as logs:
+            profiling.report()
+        self.assertIn('Profile:', logs.output[0])
+
+    def test_environment(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = SRC
+        env['TARMAN_PROFILE'] = '1'
+        with tempfile.NamedTemporaryFile() as f:
+            output = subprocess.check_output([
+                sys.executable, '-c',
+                'import sys; from tarman import profiling, containers; '
+                'containers.FileSystem().listdir(sys.argv[1]); '
+                'print(profiling.stats["listdir"][0])',
+                os.path.dirname(f.name)
+            ], env=env)
+        self.assertEqual(output.decode().strip(), '1')
+
+    def test_cli(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = SRC
+        env['TARMAN_CACHE_DIR'] = ''
+        archive = os.path.join(
+            os.path.dirname(__file__), 'testdata', 'testdata.tar.gz'
+        )
+        process = subprocess.run(
+            [sys.executable, '-m', 'tarman', '--profile', 'x', archive,
+             'nothing'],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.assertEqual(process.returncode, 1)
+        self.assertIn("'nothing' not found", process.stderr.decode())
+        self.assertIn('Profile:', process.stderr.decode())
+        self.assertIn('open', process.stderr.decode())
@@ -0,0 +1,112 @@
+from tarman import seekable
+
+import gzip
+import lzma
+import os
+import random
+import shutil
+import tempfile
+import unittest2 as unittest
+
+
+class TestSeekable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rand = random.Random(0)
+        self.data = b''.join(
+            bytes(rand.getrandbits(8) for _ in range(64)) * rand.randint(1, 64)
+            for _ in range(200)
+        )
+        self.parts = [
+            self.data[i:i + 100000] for i in range(0, len(self.data), 100000)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def check_random_access(self, reader):
+        self.assertEqual(reader.read(), self.data)
+        rand = random.Random(1)
+        for i in range(50):
+            offset = rand.randint(0, len(self.data))
+            size = rand.randint(0, 50000)
+            self.assertEqual(reader.seek(offset), offset)
+            self.assertEqual(
+                reader.read(size), self.data[offset:offset + size]
+            )
+            self.assertEqual(reader.tell(), min(offset + size, len(self.data)))
+
+    def test_not_compressed(self):
+        self.assertIsNone(seekable.open(self.write('plain', self.data)))
+
+    def test_gzip(self):
+        path = self.write('single.gz', gzip.compress(self.data))
+        reader = seekable.open(path, span=32 * 1024)
+        self.assertIsInstance(reader, seekable.GzipReader)
+        self.check_random_access(reader)
+        self.assertTrue(len(reader.checkpoints) > 1)
+        self.assertEqual(reader.export_checkpoints(), [(0, 0)])
+        reader.close()
+
+    def test_gzip_members(self):
+        members = [gzip.compress(p) for p in self.parts]
+        path = self.write('multi.gz', b''.join(members))
+        reader = seekable.open(path)
+        self.check_random_access(reader)
+        checkpoints = reader.export_checkpoints()
+        self.assertEqual(
+            checkpoints[1],
+            (len(self.parts[0]), len(members[0]))
+        )
+        reader.close()
+
+        reader = seekable.open(path)
+        reader.import_checkpoints(checkpoints)
+        self.assertEqual(reader.export_checkpoints(), checkpoints)
+        reader.seek(len(self.data) - 10)
+        self.assertEqual(reader.read(), self.data[-10:])
+        reader.close()
+
+    def test_gzip_truncated(self):
+        data = gzip.compress(self.data)
+        reader = seekable.open(self.write('cut.gz', data[:len(data) // 2]))
+        with self.assertRaises(EOFError):
+            reader.read()
+        reader.close()
+
+    def test_gzip_truncated_member(self):
+        # the first member is whole, the last one ends early
+        members = [gzip.compress(p) for p in self.parts]
+        data = b''.join(members)
+        path = self.write('cut.gz', data[:len(data) - len(members[-1]) // 2])
+        reader = seekable.open(path, span=32 * 1024)
+        self.assertEqual(reader.read(len(self.parts[0])), self.parts[0])
+        with self.assertRaises(EOFError):
+            reader.seek(len(self.data) - 10)
+            reader.read()
+        # what was read before the end is still there
+        reader.seek(10)
+        self.assertEqual(reader.read(10), self.data[10:20])
+        reader.close()
+
+    def test_xz_streams(self):
+        path = self.write(
+            'multi.xz', b''.join(lzma.compress(p) for p in self.parts)
+        )
+        reader = seekable.open(path)
+        self.assertIsInstance(reader, seekable.XzReader)
+        self.assertEqual(len(reader.blocks), len(self.parts))
+        self.check_random_access(reader)
+        reader.close()
+
+    def test_xz_single_block(self):
+        self.assertIsNone(
+            seekable.open(self.write('single.xz', lzma.compress(self.data)))
+        )
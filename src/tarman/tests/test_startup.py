@@ -0,0 +1,68 @@
+from tarman.constants import VERSION
+
+import os
+import subprocess
+import sys
+import unittest2 as unittest
+
+
+SRC = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+# prints the modules of sys.argv that were executed, lazy ones do not count
+LOADED = """
+import sys, types
+__import__(sys.argv[1])
+print(' '.join(
+    name for name in sys.argv[2:]
+    if type(sys.modules.get(name)) is types.ModuleType
+))
+"""
+
+
+class TestStartup(unittest.TestCase):
+
+    def run_python(self, *args):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = SRC
+        return subprocess.check_output(
+            [sys.executable] + list(args), env=env
+        ).decode().strip()
+
+    def loaded(self, module, *names):
+        return self.run_python('-c', LOADED, module, *names).split()
+
+    def test_version(self):
+        self.assertEqual(
+            self.run_python('-m', 'tarman', '--version'),
+            "tarman {0}".format(VERSION)
+        )
+
+    def test_package_is_light(self):
+        self.assertEqual(
+            self.loaded('tarman', 'curses', 'tarman.containers', 'logging'),
+            []
+        )
+
+    def test_backends_are_lazy(self):
+        self.assertEqual(
+            self.loaded(
+                'tarman.browser', 'tarfile', 'zipfile', 'lzma',
+                'concurrent.futures', 'tarman.overlaywin', 'tempfile'
+            ),
+            []
+        )
+
+    def test_cli_without_curses(self):
+        self.assertEqual(self.loaded('tarman.cli', 'curses'), [])
+
+    def test_without_lzma(self):
+        # like a Python built without _lzma
+        archive = os.path.join(
+            os.path.dirname(__file__), 'testdata', 'testdata.tar.gz'
+        )
+        self.assertEqual(self.run_python('-c', (
+            'import sys; sys.modules["lzma"] = None; '
+            'from tarman.containers import Tar; '
+            'tar = Tar(sys.argv[1]); '
+            'print(" ".join(sorted(tar.listdir(tar.path))))'
+        ), archive), 'a b c')
@@ -2,6 +2,10 @@
 from tarman.containers import FileSystem
 from tarman.exceptions import OutOfRange
 from tarman.tree import DirectoryTree
+from tarman.tree import FileNode
+from tarman.tree import LEAVES
+from tarman.tree import POST
+from tarman.tree import SelectionTree
 
 import os
 import tarman
@@ -50,3 +54,157 @@ class TestDirectoryTree(unittest.TestCase):
         with tempfile.NamedTemporaryFile() as f:
             with self.assertRaises(OutOfRange):
                 tree.add(f.name)
+
+    def test_get_child(self):
+        tree = DirectoryTree(self.testdatapath, self.fs)
+        path1 = self.fs.join(self.testdatapath, 'a', 'aa', 'aaa')
+        node = tree.add(path1)
+        self.assertIs(tree[path1], node)
+        self.assertIs(node.parent.get_child('aaa'), node)
+        self.assertIsNone(node.parent.get_child('missing'))
+
+    def test_del_item(self):
+        tree = DirectoryTree(self.testdatapath, self.fs)
+        path1 = self.fs.join(self.testdatapath, 'a', 'aa', 'aaa')
+        path2 = self.fs.join(self.testdatapath, 'a', 'ab')
+        tree.add(path1)
+        tree.add(path2)
+        del tree[path1]
+        self.assertNotIn(path1, tree)
+        self.assertIn(path2, tree)
+        self.assertEqual(
+            tree[self.fs.join(self.testdatapath, 'a')].get_children_data(),
+            ['aa', 'ab']
+        )
+
+    def test_add_many(self):
+        tree = DirectoryTree(self.testdatapath, self.fs)
+        nodes = tree.add_many(['a/aa/aaa', 'a/ac', 'b/ba/baa/', 'a/ab/.abb'])
+        self.assertEqual(
+            [n.get_path() for n in nodes],
+            [
+                self.fs.join(self.testdatapath, 'a', 'aa', 'aaa'),
+                self.fs.join(self.testdatapath, 'a', 'ac'),
+                self.fs.join(self.testdatapath, 'b', 'ba', 'baa'),
+                self.fs.join(self.testdatapath, 'a', 'ab', '.abb'),
+            ]
+        )
+        # implicit parent directories
+        self.assertIn(self.fs.join(self.testdatapath, 'b', 'ba'), tree)
+        self.assertEqual(
+            tree[self.fs.join(self.testdatapath, 'a')].get_children_data(),
+            ['aa', 'ac', 'ab']
+        )
+
+    def test_traverse(self):
+        tree = DirectoryTree(self.testdatapath, self.fs)
+        tree.add_many(['a/aa/aaa', 'a/ac', 'b/ba'])
+        a = tree[self.fs.join(self.testdatapath, 'a')]
+        self.assertEqual(
+            [n.data for n in a.traverse()], ['a', 'aa', 'aaa', 'ac']
+        )
+        self.assertEqual(
+            [n.data for n in tree.root.traverse(POST)][:-1],
+            ['aaa', 'aa', 'ac', 'a', 'ba', 'b']
+        )
+        self.assertEqual(
+            [n.data for n in tree.root.traverse(LEAVES)],
+            ['aaa', 'ac', 'ba']
+        )
+        self.assertEqual(
+            [n.data for n in a.traverse(prune=lambda n: n.data == 'aa')],
+            ['a', 'aa', 'ac']
+        )
+
+    def test_add_deep(self):
+        # the container is passed down, not looked up from every node
+        reads = []
+        container = FileNode.container
+        FileNode.container = property(
+            lambda node: reads.append(node) or container.fget(node)
+        )
+        try:
+            tree = DirectoryTree(self.testdatapath, self.fs)
+            path = self.fs.join(self.testdatapath, *(['d'] * 1000))
+            self.assertEqual(tree.add(path).depth, 1000)
+        finally:
+            FileNode.container = container
+        self.assertEqual(reads, [])
+
+    def test_iter_deep(self):
+        tree = DirectoryTree(self.testdatapath, self.fs)
+        tree.add_many(['/'.join(['d'] * 5000)])
+        leaves = list(tree)
+        self.assertEqual(len(leaves), 1)
+        self.assertEqual(leaves[0].depth, 5000)
+        self.assertTrue(leaves[0].get_path().endswith('/d/d'))
+
+
+class TestSelectionTree(unittest.TestCase):
+
+    def setUp(self):
+        self.testfilepath = tarman.tests.test_containers.__file__
+        self.testdirectory = os.path.dirname(self.testfilepath)
+        self.testdatapath = os.path.join(
+            self.testdirectory, 'testdata', 'testdata'
+        )
+        self.fs = FileSystem()
+        self.tree = SelectionTree(self.testdatapath, self.fs)
+
+    def path(self, *names):
+        return self.fs.join(self.testdatapath, *names)
+
+    def test_add_is_lazy(self):
+        node = self.tree.add(self.path('b'))
+        self.assertEqual(node.childmap, {})
+        self.assertIn(self.path('b'), self.tree)
+        self.assertIn(self.path('b', 'ba', 'baa', 'baab'), self.tree)
+        self.assertNotIn(self.path('a'), self.tree)
+
+    def test_exclude(self):
+        self.tree.add(self.path('b'))
+        del self.tree[self.path('b', 'ba', 'baa')]
+        self.assertNotIn(self.path('b', 'ba', 'baa'), self.tree)
+        self.assertNotIn(self.path('b', 'ba', 'baa', 'baab'), self.tree)
+        self.assertIn(self.path('b', 'ba'), self.tree)
+
+        # select again inside of the excluded subtree
+        self.tree.add(self.path('b', 'ba', 'baa', 'baaa'))
+        self.assertIn(self.path('b', 'ba', 'baa', 'baaa', 'baaaa'),
+                      self.tree)
+        self.assertNotIn(self.path('b', 'ba', 'baa', 'baab'), self.tree)
+
+    def test_unselect(self):
+        self.tree.add(self.path('a'))
+        del self.tree[self.path('a')]
+        self.assertNotIn(self.path('a'), self.tree)
+        self.assertNotIn(self.path('a', 'ac'), self.tree)
+
+    def test_contains_remembered(self):
+        path = self.path('b', 'ba', 'baa', 'baab')
+        self.assertNotIn(path, self.tree)
+        self.tree.add(self.path('b'))
+        self.assertIn(path, self.tree)
+        # only the directory asked about last is kept
+        self.assertEqual(self.tree.last[0], self.path('b', 'ba', 'baa'))
+        self.assertIn(self.path('b', 'ba', 'baa', 'baaa'), self.tree)
+        self.assertNotIn(self.path('c'), self.tree)
+        self.assertEqual(self.tree.last[0], self.path())
+        del self.tree[self.path('b', 'ba')]
+        self.assertNotIn(path, self.tree)
+        self.assertIn(self.path('b'), self.tree)
+
+    def test_walk(self):
+        self.tree.add(self.path('a'))
+        self.tree.add(self.path('b', 'ba', 'baa'))
+        del self.tree[self.path('a', 'aa')]
+        del self.tree[self.path('b', 'ba', 'baa', 'baaa', 'baaaa')]
+        self.assertEqual(
+            [arcname for path, arcname in self.tree.walk()],
+            [
+                'a', 'a/ab', 'a/ab/.abb', 'a/ac',
+                'b', 'b/ba', 'b/ba/baa', 'b/ba/baa/baaa', 'b/ba/baa/baab'
+            ]
+        )
+        for path, arcname in self.tree.walk():
+            self.assertEqual(path, self.path(*arcname.split('/')))
@@ -1,63 +1,114 @@
+from tarman import profiling
 from tarman.exceptions import NotFound
 from tarman.exceptions import AlreadyExists
 from tarman.exceptions import OutOfRange
 
+import gc
+import itertools
+
+
+# states of SelectionTree nodes
+SELECTED = 1
+EXCLUDED = 2
+
+# orders of traverse
+PRE = 'pre'
+POST = 'post'
+LEAVES = 'leaves'
+
+
+def traverse(root, children, order=PRE, prune=None):
+    """Yield `root` and everything below it without recursion.
+
+    `children(item)` returns the items below `item`, it is called once per
+    item, when its subtree is entered. With order PRE parents come before
+    their children, with POST after them and LEAVES only yields items
+    without children. When `prune(item)` is true the subtree below the item
+    is skipped and the item counts as a leaf.
+    """
+    stack = [iter((root, ))]
+    parents = []
+    while stack:
+        for item in stack[-1]:
+            break
+        else:
+            stack.pop()
+            if parents:
+                item = parents.pop()
+                if order == POST:
+                    yield item
+            continue
+
+        if prune is not None and prune(item):
+            yield item
+            continue
+
+        below = iter(children(item))
+        if order == PRE:
+            yield item
+        elif order == LEAVES:
+            for first in below:
+                below = itertools.chain((first, ), below)
+                break
+            else:
+                yield item
+                continue
+        stack.append(below)
+        parents.append(item)
+
 
 class Node():
 
-    def __init__(self, data, parent=None, children=[]):
+    __slots__ = ('parent', 'childmap', 'data', 'depth')
+
+    def __init__(self, data, parent=None, children=None):
         self.parent = parent
-        self.children = children
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.childmap = {}
         self.data = data
+        for child in children or []:
+            self.childmap[child.data] = child
+
+    @property
+    def children(self):
+        return list(self.childmap.values())
 
     def add_child(self, data):
         tmp = Node(data=data, parent=self)
-        if self.children:
-            self.children += [tmp]
-        else:
-            self.children = [tmp]
+        self.childmap[data] = tmp
         return tmp
 
     def __iter__(self):
-        for child in self.children:
-            if child.children:
-                for c in child:
-                    yield c
-            else:
-                yield child
+        """Yield the leaves below this node."""
+        if self.childmap:
+            for node in self.traverse(LEAVES):
+                yield node
+
+    def traverse(self, order=PRE, prune=None):
+        return traverse(self, lambda node: node.children, order, prune)
 
     def get_array(self):
-        result = []
+        result = [None] * (self.depth + 1)
         tmp = self
         while tmp is not None:
-            result = [tmp] + result
+            result[tmp.depth] = tmp
             tmp = tmp.parent
         return result
 
     def get_data_array(self):
-        result = []
-        tmp = self
-        while tmp is not None:
-            result = [tmp.data] + result
-            tmp = tmp.parent
-        return result
+        return [node.data for node in self.get_array()]
 
     def __str__(self):
         return self.data
 
     def get_child(self, data):
-        for c in self.children:
-            if c.data == data:
-                return c
-        return None
+        return self.childmap.get(data)
 
     def del_self(self):
         if self.parent is None:
             return
-        for i in range(len(self.parent.children)):
-            if self.parent.children[i].data == self.data:
-                del self.parent.children[i]
-                return
+        if self.parent.childmap.get(self.data) is self:
+            del self.parent.childmap[self.data]
 
 
 class Tree():
@@ -67,45 +118,92 @@ class Tree():
 
 
 class FileNode(Node):
+    """Node of a DirectoryTree. Only the root keeps a reference to the
+    container, the full path of a node is cached once it was asked for.
+    """
+
+    __slots__ = ('info', 'state', 'count', 'size', 'csize', 'path')
+
+    def __new__(cls, path, container, parent=None, sub=True, name=None):
+        if parent is None and cls is FileNode:
+            cls = RootFileNode
+        return Node.__new__(cls)
 
-    def __init__(self, path, container, parent=None, sub=True):
+    def __init__(self, path, container, parent=None, sub=True, name=None):
         try:
-            self.container = container
             self.parent = parent
             if self.parent is None:
+                self.container = container
+                self.depth = 0
                 self.data = path
+                self.path = path
             else:
-                self.data = self.container.basename(path)
-                for c in self.parent.children:
-                    if self.data == c.data:
+                self.depth = parent.depth + 1
+                self.path = path
+                if name is not None:
+                    self.data = name
+                else:
+                    self.data = container.basename(path)
+                    c = self.parent.get_child(self.data)
+                    if c is not None:
                         raise AlreadyExists(
                             "'{0}' is in '{1}'".format(self.data, path),
                             c
                         )
-            self.children = []
-            if sub and self.is_dir():
-                for n in self.container.listdir(path):
-                    self.add_subdir(self.container.join(path, n))
+            self.childmap = {}
+            self.info = None
+            self.state = None
+            # files in the subtree and their sizes, see update_totals
+            self.count = 0
+            self.size = 0
+            self.csize = 0
+            if sub and container.isenterable(path):
+                for n in container.listdir(path):
+                    self.add_subdir(
+                        container.join(path, n), container=container
+                    )
         except OSError:
             raise NotFound(path)
 
+    @property
+    def container(self):
+        tmp = self
+        while tmp.parent is not None:
+            tmp = tmp.parent
+        return tmp.container
+
+    def add_child(self, data):
+        tmp = FileNode(None, None, parent=self, sub=False, name=data)
+        self.childmap[data] = tmp
+        return tmp
+
     def is_dir(self):
         return self.container.isenterable(self.get_path())
 
     def get_path(self):
-        if self.parent:
-            return self.container.join(*self.get_data_array())
-        else:
-            return self.data
-
-    def add_subdir(self, path, parent=None, sub=True):
+        if self.path is None:
+            # ancestors without a cached path, nearest first
+            missing = []
+            tmp = self
+            while tmp.path is None:
+                missing.append(tmp)
+                tmp = tmp.parent
+            join = self.container.join
+            for node in reversed(missing):
+                node.path = join(node.parent.path, node.data)
+        return self.path
+
+    def add_subdir(self, path, parent=None, sub=True, container=None):
+        # the container property walks up to the root, callers that know
+        # it pass it
         parent = parent if parent else self
+        container = container or self.container
+        existing = self.get_child(container.basename(path))
+        if existing is not None:
+            return existing
         try:
-            tmp = FileNode(path, self.container, parent=self, sub=sub)
-            if self.children:
-                self.children += [tmp]
-            else:
-                self.children = [tmp]
+            tmp = FileNode(path, container, parent=self, sub=sub)
+            self.childmap[tmp.data] = tmp
             return tmp
         except AlreadyExists as e:
             # self.add_subdir(path=path, parent=e.child, sub=sub)
@@ -113,17 +211,19 @@ class FileNode(Node):
 
     def _get_array_by_path(self, path):
         result = []
-        prefix, name = self.container.split(path)
+        split = self.container.split
+        prefix, name = split(path)
         while name:
-            result = [name] + result
-            prefix, name = self.container.split(prefix)
+            result.append(name)
+            prefix, name = split(prefix)
+        result.reverse()
         return result
 
     def get_children_data(self):
-        return [c.data for c in self.children]
+        return list(self.childmap)
 
     def __eq__(self, node):
-        if node == self:
+        if node is self:
             return True
 
         if not isinstance(node, FileNode):
@@ -135,91 +235,233 @@ class FileNode(Node):
         return self.container.samefile(f1, f2)
 
 
+class RootFileNode(FileNode):
+
+    __slots__ = ('container',)
+
+
 class DirectoryTree(Tree):
 
     def __init__(self, root_dir, container):
         self.root_dir = root_dir
         self.container = container
         self.root = FileNode(self.root_dir, self.container, sub=False)
+        self.root_array = self.root._get_array_by_path(self.root_dir)
 
     def __iter__(self):
         return self.root.__iter__()
 
-    def add(self, path, sub=False):
-        main_array = self.root._get_array_by_path(self.root_dir)
+    def _get_relative_array(self, path):
         path_array = self.root._get_array_by_path(path)
+        len_main = len(self.root_array)
 
-        d = self.root
-        len_main = len(main_array)
-        len_path = len(path_array)
-
-        if len_main > len_path:
+        if len_main > len(path_array) or \
+                path_array[:len_main] != self.root_array:
             raise OutOfRange(path)
 
-        for i in range(len_main):
-            if main_array[i] != path_array[i]:
-                raise OutOfRange(path)
+        return path_array[len_main:]
 
-        for i in range(len_main, len_path - 1):
-            d = d.add_subdir(
-                self.container.join(d.get_path(), path_array[i]),
-                sub=False
-            )
+    def add(self, path, sub=False):
+        rel_array = self._get_relative_array(path)
 
-        if len_main < len_path:
-            d = d.add_subdir(
-                self.container.join(d.get_path(), path_array[i + 1]),
-                sub=sub
-            )
+        d = self.root
+        for i in range(len(rel_array)):
+            child = d.get_child(rel_array[i])
+            if child is None:
+                child = d.add_subdir(
+                    self.container.join(d.get_path(), rel_array[i]),
+                    sub=sub if i == len(rel_array) - 1 else False,
+                    container=self.container
+                )
+            d = child
 
         return d
 
-    def __contains__(self, path):
-        main_array = self.root._get_array_by_path(self.root_dir)
-        path_array = self.root._get_array_by_path(path)
+    @profiling.timed('tree.add')
+    def add_many(self, names, sep='/'):
+        """Add archive member names relative to root_dir in one sweep.
 
-        d = self.root
-        len_main = len(main_array)
-        len_path = len(path_array)
+        Parent directories are created implicitly. Consecutive names that
+        share a prefix reuse the nodes of the previous name, so the whole
+        hierarchy is built without walking from the root for every member.
+        Returns the nodes in the order of `names`.
+        """
+        result = []
+        # the collector would rescan the growing tree on every pass while
+        # millions of nodes are allocated, none of which are garbage yet
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._add_many(names, sep, result)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return result
 
-        if len_main > len_path:
-            raise OutOfRange(path)
+    def _add_many(self, names, sep, result):
+        prev = []
+        stack = [self.root]
+        for name in names:
+            parts = [p for p in name.split(sep) if p]
+            common = 0
+            limit = min(len(parts), len(prev))
+            while common < limit and parts[common] == prev[common]:
+                common += 1
+            del stack[common + 1:]
+            d = stack[-1]
+            for part in parts[common:]:
+                child = d.childmap.get(part)
+                d = child if child is not None else d.add_child(part)
+                stack.append(d)
+            prev = parts
+            result.append(d)
+
+    @profiling.timed('tree.totals')
+    def update_totals(self):
+        """Set count, size and csize of every node to the number of files
+        in its subtree and the sum of their sizes, taken from node.info.
+        """
+        for node in self.root.traverse(POST):
+            info = node.info
+            if info is not None and not info.isdir():
+                count, size, csize = 1, info.size, info.csize
+            else:
+                count = size = csize = 0
+            for c in node.childmap.values():
+                count += c.count
+                size += c.size
+                csize += c.csize
+            node.count = count
+            node.size = size
+            node.csize = csize
 
-        for i in range(len_main):
-            if main_array[i] != path_array[i]:
-                raise OutOfRange(path)
+    def __contains__(self, path):
+        return self[path] is not None
 
-        for i in range(len_main, len_path):
-            d = d.get_child(path_array[i])
+    @profiling.timed('lookup')
+    def __getitem__(self, path):
+        d = self.root
+        for name in self._get_relative_array(path):
+            d = d.get_child(name)
             if d is None:
-                return False
+                return None
 
-        return True
+        return d
 
-    def __getitem__(self, path):
-        main_array = self.root._get_array_by_path(self.root_dir)
-        path_array = self.root._get_array_by_path(path)
+    def __delitem__(self, path):
+        self[path].del_self()
 
-        d = self.root
-        len_main = len(main_array)
-        len_path = len(path_array)
 
-        if len_main > len_path:
-            raise OutOfRange(path)
+class SelectionTree(DirectoryTree):
+    """Checked files of one container.
 
-        for i in range(len_main):
-            if main_array[i] != path_array[i]:
-                raise OutOfRange(path)
+    Selecting a path only marks its node as SELECTED, the subtree below it
+    is never read into the tree. Unselecting a path inside a selected
+    subtree marks it EXCLUDED. Other nodes are parents of marked ones and
+    count as checked themselves, like with DirectoryTree. Subtrees are
+    listed through the container by walk, while they are walked.
 
-        for i in range(len_main, len_path):
-            d = d.get_child(path_array[i])
-            if d is None:
-                return None
-            if d.data == path_array[i]:
-                continue
+    `in` keeps the node of the directory it was last asked about, so
+    asking for the rows on screen, which are all in one directory, is a
+    dictionary lookup each.
+    """
 
+    def __init__(self, root_dir, container):
+        DirectoryTree.__init__(self, root_dir, container)
+        # (path, node or None, inherited state) of the last directory
+        self.last = None
+
+    def rebind(self, container):
+        """Walk `container` from now on, the archive opened again after it
+        was closed.
+        """
+        self.container = self.root.container = container
+
+    def add(self, path, sub=True):
+        self.last = None
+        d = DirectoryTree.add(self, path, sub=False)
+        if sub:
+            d.state = SELECTED
+            d.childmap.clear()
         return d
 
-    def __delitem__(self, path):
-        self[path].del_self()
+    def _lookup(self, path):
+        """Return the node of `path` (None if there is none) and the state
+        it inherits from its ancestors.
+        """
+        d = self.root
+        inherited = None
+        for name in self._get_relative_array(path):
+            if d.state is not None:
+                inherited = d.state
+            d = d.get_child(name)
+            if d is None:
+                break
+        return d, inherited
 
+    def __contains__(self, path):
+        if path == self.root.data:
+            d, inherited = self.root, None
+        else:
+            dirname = self.container.dirname(path)
+            if self.last is None or self.last[0] != dirname:
+                self.last = (dirname, ) + self._lookup(dirname)
+            dirname, d, inherited = self.last
+            if d is not None:
+                if d.state is not None:
+                    inherited = d.state
+                d = d.get_child(self.container.basename(path))
+        if d is None:
+            return inherited == SELECTED
+        return d.state != EXCLUDED
+
+    def __delitem__(self, path):
+        self.last = None
+        d, inherited = self._lookup(path)
+        if inherited == SELECTED:
+            d = DirectoryTree.add(self, path, sub=False)
+            d.state = EXCLUDED
+            d.childmap.clear()
+        elif d is self.root:
+            d.state = None
+            d.childmap.clear()
+        elif d is not None:
+            d.del_self()
+
+    def walk(self, prune=None):
+        """Yield (path, arcname) for every checked path, parents before
+        their children, arcnames relative to root_dir. Nothing below a path
+        for which `prune(path)` is true is yielded.
+        """
+        join = self.container.join
+
+        def item(path, arcname, node, inherited):
+            if node is None:
+                return path, arcname, None, inherited, inherited == SELECTED
+            state = inherited if node.state is None else node.state
+            return path, arcname, node, state, node.state != EXCLUDED
+
+        def children(parent):
+            path, arcname, node, state, checked = parent
+            # links are added as links, like tar does, whatever they
+            # point to, or a link to a parent directory never ends
+            if state == SELECTED and not self.container.islink(path) and \
+                    self.container.isenterable(path):
+                names = sorted(self.container.listdir(path))
+            elif node is not None:
+                names = node.get_children_data()
+            else:
+                return
+            for n in names:
+                yield item(
+                    join(path, n),
+                    arcname + '/' + n if arcname else n,
+                    node.get_child(n) if node is not None else None,
+                    state
+                )
+
+        for path, arcname, node, state, checked in traverse(
+                item(self.root.data, '', self.root, None), children,
+                prune=prune and (lambda i: prune(i[0]))):
+            if arcname and checked:
+                yield path, arcname